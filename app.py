@@ -1,16 +1,40 @@
 # ======================= return articles json with image url ===============
-from flask import Flask, jsonify
-import requests
+from flask import Flask, jsonify, request, Response, abort, send_file, g
+from werkzeug.security import safe_join
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from datetime import datetime, timedelta
 import pytz
-import re
+import socket
+import hashlib
+import hmac
 import logging
+import os
+import threading
+import time
+
+from feed import ArticleFeed, FEED_REPLAY_SIZE, FEED_RETRY_MS, parse_last_event_id
+from store import ArticleStore, StoreWatcher, OUTPUT_CSV
+from snapshot import SnapshotReader, SNAPSHOT_PATH
+from metrics import Registry, SCRAPER_METRICS_FILE
+from rollups import Rollups, STATS_PATH, ROLLUP_DAYS, ROLLUP_HOURS
+import profiling
+import sites
+import upstream
+from log_setup import setup_logging
 
 app = Flask(__name__)
+# Let nginx/Apache stream files itself when deployed behind one
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+# Requests may opt into profiling with ?profile=1|json|cprofile or an X-Profile header.
+# Off by default: timelines expose internal timings and upstream URLs. With
+# PROFILE_TOKEN set, requests must also send it in X-Profile-Token; cProfile
+# (which writes .pstats files) additionally needs ENABLE_CPROFILE=1.
+app.config['PROFILING'] = os.environ.get('ENABLE_PROFILING', '0') == '1'
+app.config['CPROFILE'] = os.environ.get('ENABLE_CPROFILE', '0') == '1'
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()  # console only, via the queue listener thread
 logger = logging.getLogger(__name__)
 
 HEADERS = {
@@ -18,15 +42,47 @@ HEADERS = {
                   '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
 }
 
-CATEGORY_URLS = [
-    "https://www.dhakapost.com/latest-news",
-    "https://www.dhakapost.com/bangladesh",
-    "https://www.dhakapost.com/world",
-    "https://www.dhakapost.com/sports",
-    "https://www.dhakapost.com/entertainment"
-]
-PAGINATION_PATTERN = "?page={}"
 MIN_ARTICLES = 10  # limit for API call
+IMAGE_DIR = os.path.abspath("images")  # where scrapper.py stores downloaded images
+IMAGE_MAX_AGE = 365 * 24 * 3600  # images are written once under a URL-hash name and never modified
+# Every open /articles/stream holds one worker thread; keep the rest for other requests
+MAX_STREAMS = int(os.environ.get("MAX_STREAMS_PER_WORKER",
+                                 str(max(1, int(os.environ.get("GUNICORN_THREADS", "64")) // 2))))
+
+article_feed = ArticleFeed()
+article_stats = Rollups(STATS_PATH)
+
+# API-process metrics; scraper stage metrics come from the scraper's textfile
+api_metrics = Registry()
+API_LATENCY = api_metrics.histogram(
+    'api_request_duration_seconds', 'Time to produce an API response', ['endpoint', 'status'])
+STREAMS_REJECTED = api_metrics.counter(
+    'api_streams_rejected_total', 'Stream connections refused because the worker was at MAX_STREAMS')
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+def open_article_store():
+    # Prefer the shared mmap snapshot; the CSV tail reader keeps a private copy per worker
+    store = SnapshotReader(SNAPSHOT_PATH) if os.path.exists(SNAPSHOT_PATH) else ArticleStore(OUTPUT_CSV)
+    store.on_new = article_feed.publish
+    return store
+
+def upgrade_article_store(store):
+    """Switch from the CSV reader to the snapshot once the scraper has written one"""
+    global article_store
+    if isinstance(store, SnapshotReader) or not os.path.exists(SNAPSHOT_PATH):
+        return None
+    # Anything the CSV reader has not published yet goes out before it is dropped
+    store.refresh()
+    reader = SnapshotReader(SNAPSHOT_PATH)
+    reader.on_new = article_feed.publish
+    reader.refresh()
+    article_store = reader
+    logger.info(f"Switched to the shared article snapshot ({len(reader)} articles)")
+    return reader
+
+article_store = open_article_store()
+store_watcher = None
+store_watcher_lock = threading.Lock()
 
 def get_bangladesh_time():
     bd_tz = pytz.timezone('Asia/Dhaka')
@@ -61,170 +117,336 @@ def is_today_or_yesterday(date_str):
     except Exception:
         return True
 
+def fetch(url, hedge=False):
+    if profiling.active():
+        # requests doesn't expose DNS timing, so resolve up front when profiling
+        parsed = urlparse(url)
+        with profiling.span('dns', parsed.hostname):
+            try:
+                socket.getaddrinfo(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+            except OSError:
+                pass
+    with profiling.span('fetch', url):
+        response, content, encoding = upstream.get_body(url, headers=HEADERS, timeout=15, hedge=hedge)
+        profiling.record('upstream_wait', response.elapsed.total_seconds(), url)
+        response.raise_for_status()
+    return content.decode(encoding, errors='replace')
+
+def parse_article_links(html, url, parser='html.parser'):
+    with profiling.span('parse', url):
+        soup = BeautifulSoup(html, parser)
+    site = sites.site_for_url(url)
+    article_links = []
+    article_containers = site.listing_containers.select(soup) if site.listing_containers else []
+    if not article_containers and site.listing_fallback_containers:
+        article_containers = site.listing_fallback_containers.select(soup)
+    if not article_containers:
+        article_containers = [soup]
+    profiling.checkpoint('extract.containers')
+
+    for container in article_containers:
+        links = container.find_all('a')
+        for link in links:
+            href = link.get('href')
+            if not href or href.startswith('#') or href.startswith('javascript:'):
+                continue
+            if site.is_article_link(href):
+                full_url = urljoin(url, href)
+                if full_url not in article_links:
+                    article_links.append(full_url)
+    profiling.checkpoint('extract.links')
+    return article_links
+
 def get_article_links_from_page(url):
     logger.info(f"Fetching article links from {url}")
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        article_links = []
-        article_containers = soup.select('.card, .news-item, article, .list-item, .news-card, .news-list, .article-list')
-        if not article_containers:
-            article_containers = soup.select('div[class*="news"], div[class*="article"], div[class*="post"], a[href*="/news/"]')
-        if not article_containers:
-            article_containers = [soup]
-
-        for container in article_containers:
-            links = container.find_all('a')
-            for link in links:
-                href = link.get('href')
-                if not href or href.startswith('#') or href.startswith('javascript:'):
-                    continue
-                article_indicators = ['/news/', '/article/', '/story/', '/latest-news/',
-                                      '/bangladesh/', '/world/', '/sports/', '/entertainment/']
-                if any(ind in href for ind in article_indicators):
-                    full_url = urljoin(url, href)
-                    if full_url not in article_links:
-                        article_links.append(full_url)
-        return article_links
+        html = fetch(url, hedge=upstream.HEDGE_LISTINGS)
+        return parse_article_links(html, url)
     except Exception as e:
         logger.error(f"Error fetching article links from {url}: {e}")
         return []
 
-def get_article_links():
+def get_article_links(site=None):
+    site = site or sites.default_site()
     all_links = []
-    for category_url in CATEGORY_URLS:
+    for category_url in site.listing_urls:
         links = get_article_links_from_page(category_url)
         all_links.extend(links)
         if len(set(all_links)) < MIN_ARTICLES * 2:
             for page in range(2, 4):
-                paginated_url = f"{category_url}{PAGINATION_PATTERN.format(page)}"
+                paginated_url = f"{category_url}{site.pagination.format(page)}"
                 page_links = get_article_links_from_page(paginated_url)
                 if not page_links:
                     break
                 all_links.extend(page_links)
     return list(set(all_links))
 
+def parse_article(html, url, parser='html.parser'):
+    with profiling.span('parse', url):
+        soup = BeautifulSoup(html, parser)
+    site = sites.site_for_url(url)
+
+    # Title extraction
+    title = None
+    for selector in site.title_selectors:
+        el = selector.select_one(soup)
+        if el and el.text.strip():
+            title = el.text.strip()
+            break
+    profiling.checkpoint('extract.title')
+    if not title:
+        return None
+
+    # Date extraction
+    date_text = None
+    for selector in site.date_selectors:
+        el = selector.select_one(soup)
+        if el:
+            dt = el.get('datetime')
+            if dt:
+                date_text = dt
+                break
+            text = el.text.strip()
+            if text:
+                date_text = text
+                break
+    if not date_text:
+        date_text = ""
+    profiling.checkpoint('extract.date')
+
+    if not is_today_or_yesterday(date_text):
+        logger.info(f"Article date not today or yesterday: {date_text}")
+        # return None  # optional: exclude older articles
+
+    # Content extraction
+    content = ""
+    for _, selector in site.content_selectors:
+        paras = selector.select(soup)
+        if paras:
+            content = "\n\n".join(p.text.strip() for p in paras if len(p.text.strip()) > site.min_paragraph_length)
+            if content:
+                break
+    if not content:
+        content = "Content not available"
+    profiling.checkpoint('extract.content')
+
+    # Image URLs extraction - simplified
+    img_urls = []
+    article_container = site.find_container(soup)
+    if article_container:
+        imgs = article_container.find_all('img')
+    else:
+        imgs = soup.find_all('img')
+
+    for img in imgs:
+        img_url = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
+        if img_url and not any(pat in img_url.lower() for pat in site.image_exclude):
+            full_img_url = urljoin(url, img_url)
+            if full_img_url not in img_urls:
+                img_urls.append(full_img_url)
+    profiling.checkpoint('extract.images')
+
+    # Category detection by URL path
+    category = site.category_for(url)
+
+    # Author extraction
+    author = None
+    for selector in site.author_selectors:
+        el = selector.select_one(soup)
+        if el and el.text.strip():
+            author = el.text.strip()
+            break
+    if not author:
+        author = "Unknown"
+    profiling.checkpoint('extract.category_author')
+
+    article_data = {
+        'title': title,
+        'date': date_text,
+        'url': url,
+        'content': content,
+        'images': img_urls,
+        'local_images': [],
+        'category': category,
+        'author': author,
+        'scraped_at': get_bangladesh_time().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return article_data
+
 def extract_article_content(url):
     logger.info(f"Extracting article from {url}")
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Title extraction
-        title = None
-        for sel in ['h1', '.article-title', '.news-title', '.title', '.headline', '.entry-title']:
-            els = soup.select(sel)
-            if els and els[0].text.strip():
-                title = els[0].text.strip()
-                break
-        if not title:
-            return None
-
-        # Date extraction
-        date_text = None
-        for sel in ['time', '.date', '.published-date', '.article-date', '[itemprop="datePublished"]']:
-            els = soup.select(sel)
-            if els:
-                dt = els[0].get('datetime')
-                if dt:
-                    date_text = dt
-                    break
-                text = els[0].text.strip()
-                if text:
-                    date_text = text
-                    break
-        if not date_text:
-            date_text = ""
-
-        if not is_today_or_yesterday(date_text):
-            logger.info(f"Article date not today or yesterday: {date_text}")
-            # return None  # optional: exclude older articles
-
-        # Content extraction
-        content = ""
-        for sel in ['article p', '.article-body p', '.content p', '#content p', '.news-content p']:
-            paras = soup.select(sel)
-            if paras:
-                content = "\n\n".join(p.text.strip() for p in paras if len(p.text.strip()) > 20)
-                if content:
-                    break
-        if not content:
-            content = "Content not available"
-
-        # Image URLs extraction - simplified
-        img_urls = []
-        article_container = soup.find('article') or soup.select_one('.article, .article-body, .story-content, .entry-content, .news-details')
-        if article_container:
-            imgs = article_container.find_all('img')
-        else:
-            imgs = soup.find_all('img')
-
-        exclude_patterns = ['icon', 'logo', 'blank.gif', 'pixel.gif', 'advertisement', 'banner', 'avatar', 'thumb', '1x1']
-        for img in imgs:
-            img_url = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
-            if img_url and not any(pat in img_url.lower() for pat in exclude_patterns):
-                full_img_url = urljoin(url, img_url)
-                if full_img_url not in img_urls:
-                    img_urls.append(full_img_url)
-
-        # Category detection by URL path
-        path = urlparse(url).path
-        category = "General"
-        if "/bangladesh/" in path:
-            category = "Bangladesh"
-        elif "/world/" in path:
-            category = "World"
-        elif "/sports/" in path:
-            category = "Sports"
-        elif "/entertainment/" in path:
-            category = "Entertainment"
-
-        # Author extraction
-        author = None
-        for sel in ['.author', '.reporter', '.byline', '[rel="author"]']:
-            els = soup.select(sel)
-            if els and els[0].text.strip():
-                author = els[0].text.strip()
-                break
-        if not author:
-            author = "Unknown"
-
-        article_data = {
-            'title': title,
-            'date': date_text,
-            'url': url,
-            'content': content,
-            'images': img_urls,
-            'category': category,
-            'author': author,
-            'scraped_at': get_bangladesh_time().strftime('%Y-%m-%d %H:%M:%S')
-        }
-        return article_data
+        html = fetch(url)
+        return parse_article(html, url)
     except Exception as e:
         logger.error(f"Error extracting article {url}: {e}")
         return None
 
+def start_store_watcher():
+    global store_watcher
+    with store_watcher_lock:
+        if store_watcher is None:
+            # Fill the replay buffer from the store, so a client resuming with
+            # Last-Event-ID on a fresh worker still gets what it missed
+            if not article_store.loaded:
+                article_store.refresh()
+            for article in reversed(article_store.latest(FEED_REPLAY_SIZE)):
+                article_feed.publish(article)
+            store_watcher = StoreWatcher(article_store, upgrade=upgrade_article_store)
+            store_watcher.start()
+
+@app.before_request
+def ensure_store_watcher():
+    g.request_start = time.perf_counter()
+    start_store_watcher()
+
+@app.before_request
+def start_profiling():
+    mode = request.args.get('profile') or request.headers.get('X-Profile')
+    if not mode or mode == '0' or not app.config['PROFILING']:
+        return
+    token = app.config['PROFILE_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('X-Profile-Token', ''), token):
+        return
+    g.profile_mode = mode
+    g.profile, g.profile_token = profiling.start(with_cprofile=(mode == 'cprofile' and app.config['CPROFILE']))
+
+@app.after_request
+def finish_profiling(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profiling.stop(profile, g.pop('profile_token'))
+    response.headers['Server-Timing'] = profile.server_timing()
+    if g.profile_mode in ('json', 'cprofile') and response.is_json and not response.is_streamed:
+        body = response.get_json()
+        if isinstance(body, dict):
+            body['_profile'] = profile.timeline()
+            stats_path = profile.dump_stats(label=request.endpoint or 'request')
+            if stats_path:
+                body['_profile']['pstats'] = stats_path
+            response.set_data(app.json.dumps(body))
+    return response
+
+@app.after_request
+def record_request_latency(response):
+    start = g.get('request_start')
+    if start is not None:
+        API_LATENCY.observe(time.perf_counter() - start, request.endpoint or 'unknown', response.status_code)
+    return response
+
+def scrape_live_articles():
+    article_links = get_article_links()
+    articles = []
+    count = 0
+    for link in article_links:
+        if count >= MIN_ARTICLES:
+            break
+        article = extract_article_content(link)
+        if article:
+            articles.append(article)
+            article_feed.publish(article)
+            count += 1
+    return articles
+
 @app.route('/articles', methods=['GET'])
 def get_articles():
     try:
-        article_links = get_article_links()
-        articles = []
-        count = 0
-        for link in article_links:
-            if count >= MIN_ARTICLES:
-                break
-            article = extract_article_content(link)
-            if article:
-                articles.append(article)
-                count += 1
+        with profiling.span('store.refresh'):
+            if not article_store.loaded or isinstance(article_store, SnapshotReader):
+                article_store.refresh()
+        with profiling.span('store.read'):
+            articles = article_store.latest(MIN_ARTICLES)
+        if not articles:
+            # Scheduler hasn't stored anything yet: fall back to a live scrape
+            logger.info("Article store is empty, scraping live")
+            articles = scrape_live_articles()
         return jsonify({"count": len(articles), "articles": articles})
     except Exception as e:
         logger.error(f"Error in /articles endpoint: {e}")
         return jsonify({"error": "Failed to fetch articles"}), 500
 
 
+@app.route('/articles/stream', methods=['GET'])
+def stream_articles():
+    if not stream_slots.acquire(blocking=False):
+        # The client's EventSource reconnects after `retry`, likely to a less busy worker
+        STREAMS_REJECTED.inc()
+        return Response(f"retry: {FEED_RETRY_MS}\n\n", status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(FEED_RETRY_MS // 1000)})
+    last_event_id = parse_last_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+    response = Response(
+        article_feed.stream(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    response.call_on_close(stream_slots.release)
+    return response
+
+
+_etag_cache = {}
+
+def file_etag(path, st):
+    # Hash each file once; the cache entry is invalidated if the file changes
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _etag_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    _etag_cache[path] = (key, etag)
+    return etag
+
+@app.route('/images/<path:name>', methods=['GET'])
+def get_image(name):
+    path = safe_join(IMAGE_DIR, name)
+    if path is None:
+        abort(404)
+    try:
+        st = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+    # conditional=True handles If-None-Match and Range; the file body is passed
+    # to the server's wsgi.file_wrapper, which gunicorn serves with sendfile()
+    response = send_file(path, conditional=True, etag=file_etag(path, st), max_age=IMAGE_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    body = api_metrics.render()
+    try:
+        with open(SCRAPER_METRICS_FILE, encoding='utf-8') as f:
+            body += f.read()
+    except FileNotFoundError:
+        pass
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    # Pre-aggregated by the scraper as articles are committed; only the bucket
+    # windows are merged here, never the stored articles themselves
+    hours = min(max(request.args.get('hours', 24, type=int), 0), ROLLUP_HOURS)
+    days = min(max(request.args.get('days', 7, type=int), 0), ROLLUP_DAYS)
+    with profiling.span('stats.load'):
+        article_stats.load()
+    return jsonify(article_stats.view(hours, days))
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    # Readiness probe: only route traffic here once the article cache is warm
+    if not article_store.loaded:
+        article_store.refresh()
+    if len(article_store) == 0:
+        return jsonify({'ready': False, 'articles': 0}), 503
+    return jsonify({'ready': True, 'articles': len(article_store)})
+
 @app.route('/hello', methods=['GET'])
 def hello():
     return jsonify({'message': 'Hello, World!'})
@@ -235,4 +457,5 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
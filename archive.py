@@ -0,0 +1,306 @@
+# ======================= compressed raw-HTML archive ===============
+#
+#   python archive.py stats
+#   python archive.py reextract --workers 8 --output output/reextracted.csv
+#   python archive.py reextract --since 2025-05-01 --url https://www.dhakapost.com/world/123
+#
+# Every article response the scraper fetches is appended to a segment file as
+# its own gzip member, so a record can be read back by seeking to its offset
+# and decompressing just that member. Segments roll over at a size limit and
+# are never rewritten. index.jsonl holds one line per record (url, fetch time,
+# segment, offset, compressed length), which makes re-extraction with a newer
+# parser a local, CPU-bound batch job instead of a re-crawl.
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the thread lock still covers a single process
+    fcntl = None
+
+ARCHIVE_DIR = "output/archive"
+ARCHIVE_ENABLED = os.environ.get("SCRAPER_ARCHIVE", "1") == "1"
+SEGMENT_MAX_BYTES = int(os.environ.get("ARCHIVE_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = ".archive.lock"
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".html.gz"
+COMPRESS_LEVEL = 6
+REEXTRACT_OUTPUT = "output/reextracted.csv"
+
+
+class RawArchive:
+    """Append-only store of raw responses, safe to share between fetch threads"""
+
+    def __init__(self, directory=ARCHIVE_DIR, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """Hold the archive's write lock, which also locks out other processes
+        (a CLI run next to the daemon, revisits) appending to the same segments"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, LOCK_FILE), 'a') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _segment_names(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+    def _current_segment(self, incoming):
+        """Return the segment to append to, starting a new one when the newest is full
+
+        Looked up on every append (under the lock), since another process may
+        have started a newer segment.
+        """
+        names = self._segment_names()
+        segment = names[-1] if names else f"{SEGMENT_PREFIX}00001{SEGMENT_SUFFIX}"
+        path = os.path.join(self.directory, segment)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size and size + incoming > self.segment_max_bytes:
+            number = int(segment[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+            segment = f"{SEGMENT_PREFIX}{number:05d}{SEGMENT_SUFFIX}"
+        return segment
+
+    def append(self, url, content, encoding=None, status=200, content_type=None, fetched_at=None):
+        """Store one raw response and return its index entry"""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        header = {
+            'url': url,
+            'fetched_at': fetched_at,
+            'status': status,
+            'encoding': encoding,
+            'content_type': content_type,
+            'length': len(content),
+        }
+        member = gzip.compress(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n" + content,
+                               compresslevel=COMPRESS_LEVEL, mtime=int(fetched_at))
+
+        # The offset is only ours while nobody else can append to the segment
+        with self.locked():
+            segment = self._current_segment(len(member))
+            with open(os.path.join(self.directory, segment), 'ab') as f:
+                offset = f.tell()
+                f.write(member)
+            entry = {
+                'url': url,
+                'fetched_at': fetched_at,
+                'segment': segment,
+                'offset': offset,
+                'length': len(member),
+                'size': len(content),
+                'crc32': zlib.crc32(content),
+            }
+            # The record is in its segment before the index points at it
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def expire(self, before):
+        """Delete segments whose records were all fetched before `before` (epoch seconds)
+
+        Their lines are dropped from the index, which is rewritten first: a
+        crash leaves an unindexed segment behind, never an entry pointing at
+        nothing. The newest segment is kept so numbering carries on. Returns
+        (segments removed, bytes freed).
+        """
+        with self.locked():
+            names = self._segment_names()
+            entries = list(self.entries())
+            newest = {}  # segment -> latest fetch time in it
+            for entry in entries:
+                newest[entry['segment']] = max(newest.get(entry['segment'], 0), entry['fetched_at'])
+            expired = set()
+            for name in names[:-1]:
+                last = newest.get(name)
+                if last is None:
+                    last = os.path.getmtime(os.path.join(self.directory, name))
+                if last < before:
+                    expired.add(name)
+            if not expired:
+                return 0, 0
+
+            tmp_path = f"{self.index_path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    if entry['segment'] not in expired:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, self.index_path)
+            freed = 0
+            for name in expired:
+                path = os.path.join(self.directory, name)
+                freed += os.path.getsize(path)
+                os.remove(path)
+        return len(expired), freed
+
+    def entries(self):
+        """Yield index entries in fetch order, skipping a torn final line"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def latest_entries(self, since=None, urls=None):
+        """Return the most recent entry per URL, optionally filtered by fetch time and URL"""
+        latest = {}
+        for entry in self.entries():
+            if since is not None and entry['fetched_at'] < since:
+                continue
+            if urls and entry['url'] not in urls:
+                continue
+            latest[entry['url']] = entry
+        return list(latest.values())
+
+    def read(self, entry):
+        """Return (header, raw content bytes) for an index entry"""
+        return read_record(self.directory, entry)
+
+
+def read_record(directory, entry):
+    with open(os.path.join(directory, entry['segment']), 'rb') as f:
+        f.seek(entry['offset'])
+        member = f.read(entry['length'])
+    header_line, _, content = gzip.decompress(member).partition(b"\n")
+    return json.loads(header_line), content
+
+
+_archive = None
+
+
+def default_archive():
+    """Process-wide archive used by the scraper's fetcher, or None when disabled"""
+    global _archive
+    if not ARCHIVE_ENABLED:
+        return None
+    if _archive is None:
+        _archive = RawArchive()
+    return _archive
+
+
+# --------------------------------------------------------------- re-extraction
+
+def _reextract_one(task):
+    """Runs in a worker process: re-parse one archived page with the current extractor"""
+    import pytz
+    from scrapper import parse_article
+
+    directory, entry = task
+    try:
+        header, content = read_record(directory, entry)
+        encoding = header.get('encoding')
+        html = content.decode(encoding, errors='replace') if encoding else content
+        article = parse_article(html, header['url'])
+    except Exception as e:
+        return entry['url'], None, f"{type(e).__name__}: {e}"
+    if article:
+        fetched = datetime.fromtimestamp(header['fetched_at'], pytz.timezone('Asia/Dhaka'))
+        article['scraped_at'] = fetched.strftime('%Y-%m-%d %H:%M:%S')
+    return entry['url'], article, None
+
+
+def reextract(archive, output=REEXTRACT_OUTPUT, workers=None, since=None, urls=None):
+    """Run the current parser over the newest archived copy of each URL, in parallel
+
+    Writes CSV rows in the scraper's column layout to `output` and returns
+    (articles written, failures). Images are not re-downloaded.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from pipeline import init_parse_worker, process_context
+    from store import CSV_COLUMNS, article_to_row
+
+    entries = archive.latest_entries(since=since, urls=urls)
+    tasks = [(archive.directory, entry) for entry in entries]
+    written = failed = 0
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp_path = f"{output}.tmp.{os.getpid()}"
+    context = process_context()
+    if context.get_start_method() == 'forkserver':
+        # Workers start from the forkserver, so import the extractor there once, not in each worker
+        context.set_forkserver_preload(['scrapper', 'bs4', 'soupsieve'])
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                initializer=init_parse_worker) as pool:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writeheader()
+        for url, article, error in pool.map(_reextract_one, tasks, chunksize=16):
+            if article:
+                writer.writerow(article_to_row(article))
+                written += 1
+            else:
+                failed += 1
+                print(f"failed: {url}{f' ({error})' if error else ''}", file=sys.stderr)
+    os.replace(tmp_path, output)
+    return written, failed
+
+
+def archive_stats(archive):
+    records = compressed = raw = 0
+    seen = set()
+    for entry in archive.entries():
+        records += 1
+        compressed += entry['length']
+        raw += entry['size']
+        seen.add(entry['url'])
+    return {
+        'records': records,
+        'urls': len(seen),
+        'segments': len(archive._segment_names()),
+        'raw_mb': round(raw / 1024 / 1024, 2),
+        'compressed_mb': round(compressed / 1024 / 1024, 2),
+        'ratio': round(raw / compressed, 2) if compressed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the raw-HTML archive or re-extract articles from it")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="record counts and compression ratio")
+    re_parser = sub.add_parser("reextract", help="run the current extractor over archived pages")
+    re_parser.add_argument("--output", default=REEXTRACT_OUTPUT, help="CSV file to write")
+    re_parser.add_argument("--workers", type=int, help="parse processes (default: CPU count)")
+    re_parser.add_argument("--since", help="only pages fetched on or after this date (YYYY-MM-DD)")
+    re_parser.add_argument("--url", action="append", help="only this URL (repeatable)")
+    args = parser.parse_args(argv)
+
+    archive = RawArchive(args.dir)
+    if args.command == "stats":
+        print(json.dumps(archive_stats(archive), indent=2))
+        return 0
+
+    since = time.mktime(datetime.strptime(args.since, '%Y-%m-%d').timetuple()) if args.since else None
+    start = time.perf_counter()
+    written, failed = reextract(archive, args.output, args.workers, since, set(args.url or ()))
+    elapsed = time.perf_counter() - start
+    print(f"Re-extracted {written} articles ({failed} failed) in {elapsed:.1f}s -> {args.output}")
+    return 0 if written or not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -32,12 +32,15 @@
 from flask import Flask, jsonify
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin
 from datetime import datetime, timedelta
 import pytz
 import re
 import hashlib
 import logging
+import os
+
+import sites
 
 app = Flask(__name__)
 
@@ -50,14 +53,6 @@ HEADERS = {
                   '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
 }
 
-CATEGORY_URLS = [
-    "https://www.dhakapost.com/latest-news",
-    "https://www.dhakapost.com/bangladesh",
-    "https://www.dhakapost.com/world",
-    "https://www.dhakapost.com/sports",
-    "https://www.dhakapost.com/entertainment"
-]
-PAGINATION_PATTERN = "?page={}"
 MIN_ARTICLES = 10  # limit for API call, can increase
 
 def get_bangladesh_time():
@@ -99,10 +94,11 @@ def get_article_links_from_page(url):
         response = requests.get(url, headers=HEADERS, timeout=15)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
+        site = sites.site_for_url(url)
         article_links = []
-        article_containers = soup.select('.card, .news-item, article, .list-item, .news-card, .news-list, .article-list')
-        if not article_containers:
-            article_containers = soup.select('div[class*="news"], div[class*="article"], div[class*="post"], a[href*="/news/"]')
+        article_containers = site.listing_containers.select(soup) if site.listing_containers else []
+        if not article_containers and site.listing_fallback_containers:
+            article_containers = site.listing_fallback_containers.select(soup)
         if not article_containers:
             article_containers = [soup]
 
@@ -112,9 +108,7 @@ def get_article_links_from_page(url):
                 href = link.get('href')
                 if not href or href.startswith('#') or href.startswith('javascript:'):
                     continue
-                article_indicators = ['/news/', '/article/', '/story/', '/latest-news/',
-                                      '/bangladesh/', '/world/', '/sports/', '/entertainment/']
-                if any(ind in href for ind in article_indicators):
+                if site.is_article_link(href):
                     full_url = urljoin(url, href)
                     if full_url not in article_links:
                         article_links.append(full_url)
@@ -123,14 +117,15 @@ def get_article_links_from_page(url):
         logger.error(f"Error fetching article links from {url}: {e}")
         return []
 
-def get_article_links():
+def get_article_links(site=None):
+    site = site or sites.default_site()
     all_links = []
-    for category_url in CATEGORY_URLS:
+    for category_url in site.listing_urls:
         links = get_article_links_from_page(category_url)
         all_links.extend(links)
         if len(set(all_links)) < MIN_ARTICLES * 2:
             for page in range(2, 4):
-                paginated_url = f"{category_url}{PAGINATION_PATTERN.format(page)}"
+                paginated_url = f"{category_url}{site.pagination.format(page)}"
                 page_links = get_article_links_from_page(paginated_url)
                 if not page_links:
                     break
@@ -143,27 +138,28 @@ def extract_article_content(url):
         response = requests.get(url, headers=HEADERS, timeout=15)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
+        site = sites.site_for_url(url)
 
         # Title extraction
         title = None
-        for sel in ['h1', '.article-title', '.news-title', '.title', '.headline', '.entry-title']:
-            els = soup.select(sel)
-            if els and els[0].text.strip():
-                title = els[0].text.strip()
+        for selector in site.title_selectors:
+            el = selector.select_one(soup)
+            if el and el.text.strip():
+                title = el.text.strip()
                 break
         if not title:
             return None
 
         # Date extraction
         date_text = None
-        for sel in ['time', '.date', '.published-date', '.article-date', '[itemprop="datePublished"]']:
-            els = soup.select(sel)
-            if els:
-                dt = els[0].get('datetime')
+        for selector in site.date_selectors:
+            el = selector.select_one(soup)
+            if el:
+                dt = el.get('datetime')
                 if dt:
                     date_text = dt
                     break
-                text = els[0].text.strip()
+                text = el.text.strip()
                 if text:
                     date_text = text
                     break
@@ -177,33 +173,24 @@ def extract_article_content(url):
 
         # Content extraction
         content = ""
-        for sel in ['article p', '.article-body p', '.content p', '#content p', '.news-content p']:
-            paras = soup.select(sel)
+        for _, selector in site.content_selectors:
+            paras = selector.select(soup)
             if paras:
-                content = "\n\n".join(p.text.strip() for p in paras if len(p.text.strip()) > 20)
+                content = "\n\n".join(p.text.strip() for p in paras if len(p.text.strip()) > site.min_paragraph_length)
                 if content:
                     break
         if not content:
             content = "Content not available"
 
         # Category detection by URL path
-        path = urlparse(url).path
-        category = "General"
-        if "/bangladesh/" in path:
-            category = "Bangladesh"
-        elif "/world/" in path:
-            category = "World"
-        elif "/sports/" in path:
-            category = "Sports"
-        elif "/entertainment/" in path:
-            category = "Entertainment"
+        category = site.category_for(url)
 
         # Author extraction (simple)
         author = None
-        for sel in ['.author', '.reporter', '.byline', '[rel="author"]']:
-            els = soup.select(sel)
-            if els and els[0].text.strip():
-                author = els[0].text.strip()
+        for selector in site.author_selectors:
+            el = selector.select_one(soup)
+            if el and el.text.strip():
+                author = el.text.strip()
                 break
         if not author:
             author = "Unknown"
@@ -241,4 +228,5 @@ def get_articles():
         return jsonify({"error": "Failed to fetch articles"}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; production runs app.py under gunicorn
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
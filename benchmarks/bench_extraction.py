@@ -0,0 +1,240 @@
+# ======================= offline extraction benchmarks ===============
+#
+#   python benchmarks/bench_extraction.py                  # run and compare with baseline.json
+#   python benchmarks/bench_extraction.py --save-baseline  # store current numbers as the baseline
+#   python benchmarks/bench_extraction.py --save-baseline --counts-only  # only what any machine must match
+#   python benchmarks/bench_extraction.py record --article URL --listing URL  # add live pages to the corpus
+#
+# Runs the listing and article extractors from app.py and scrapper.py over the
+# recorded pages in benchmarks/fixtures, once per available BeautifulSoup parser.
+# The committed baseline.json holds only the extraction counts, which every
+# machine must reproduce; save a full baseline locally to also check timings.
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+MANIFEST = os.path.join(FIXTURES_DIR, "manifest.json")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+PARSERS = ['html.parser', 'lxml', 'html5lib']
+TOLERANCE = 0.25  # relative slowdown allowed before a metric is flagged
+
+
+def load_fixtures():
+    """Load the recorded pages listed in the fixture manifest"""
+    with open(MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    fixtures = []
+    for entry in manifest:
+        with open(os.path.join(FIXTURES_DIR, entry['file']), encoding='utf-8') as f:
+            fixtures.append(dict(entry, html=f.read()))
+    return fixtures
+
+
+def available_parsers():
+    from bs4 import BeautifulSoup, FeatureNotFound
+    parsers = []
+    for parser in PARSERS:
+        try:
+            BeautifulSoup("<p></p>", parser)
+            parsers.append(parser)
+        except FeatureNotFound:
+            continue
+    return parsers
+
+
+def extractors():
+    """Return {mode: (parse_links, parse_article)} for each extractor implementation"""
+    import app
+    import scrapper
+    return {
+        'app': (app.parse_article_links, app.parse_article),
+        'scrapper': (scrapper.parse_article_links, scrapper.parse_article),
+    }
+
+
+def time_calls(func, pages, parser, repeat):
+    """Return per-page timings in ms (fastest of `repeat` rounds) and the results"""
+    best = [float('inf')] * len(pages)
+    results = []
+    for _ in range(repeat):
+        results = []
+        for i, page in enumerate(pages):
+            start = time.perf_counter()
+            results.append(func(page['html'], page['url'], parser=parser))
+            best[i] = min(best[i], (time.perf_counter() - start) * 1000)
+    return best, results
+
+
+def peak_memory_kb(func, pages, parser):
+    gc.collect()
+    tracemalloc.start()
+    for page in pages:
+        func(page['html'], page['url'], parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def run_benchmarks(repeat):
+    fixtures = load_fixtures()
+    listings = [f for f in fixtures if f['kind'] == 'listing']
+    articles = [f for f in fixtures if f['kind'] == 'article']
+    results = {}
+    for mode, (parse_links, parse_article) in extractors().items():
+        for parser in available_parsers():
+            key = f"{mode}/{parser}"
+            listing_ms, link_lists = time_calls(parse_links, listings, parser, repeat)
+            article_ms, extracted = time_calls(parse_article, articles, parser, repeat)
+            links = sum(len(links) for links in link_lists)
+            results[key] = {
+                'parse_ms_per_page': round(statistics.mean(listing_ms), 3),
+                'extract_ms_per_article': round(statistics.mean(article_ms), 3),
+                'links_per_sec': round(links / (sum(listing_ms) / 1000), 1) if listing_ms else 0.0,
+                'peak_kb': round(max(peak_memory_kb(parse_links, listings, parser),
+                                     peak_memory_kb(parse_article, articles, parser)), 1),
+                'articles_extracted': sum(1 for a in extracted if a),
+                'links_found': links,
+            }
+    return results
+
+
+# Output of the extractors, identical on every machine
+COUNT_METRICS = ('articles_extracted', 'links_found')
+
+# Metric -> True if higher is better
+METRICS = {
+    'parse_ms_per_page': False,
+    'extract_ms_per_article': False,
+    'links_per_sec': True,
+    'peak_kb': False,
+}
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages for results against baseline"""
+    regressions = []
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change < -tolerance) if higher_is_better else (change > tolerance):
+                regressions.append(f"{key} {metric}: {old} -> {new} ({change:+.1%})")
+        for metric in COUNT_METRICS:
+            if metric in base and metrics.get(metric) != base[metric]:
+                regressions.append(f"{key} {metric}: {base[metric]} -> {metrics.get(metric)} (output changed)")
+    return regressions
+
+
+def print_table(results, baseline):
+    header = f"{'mode/parser':<24}{'parse ms/page':>15}{'extract ms/art':>16}{'links/sec':>12}{'peak KB':>10}"
+    print(header)
+    print("-" * len(header))
+    for key, m in results.items():
+        print(f"{key:<24}{m['parse_ms_per_page']:>15.2f}{m['extract_ms_per_article']:>16.2f}"
+              f"{m['links_per_sec']:>12.0f}{m['peak_kb']:>10.0f}")
+        base = baseline.get(key)
+        if base and 'parse_ms_per_page' in base:
+            print(f"{'  baseline':<24}{base['parse_ms_per_page']:>15.2f}{base['extract_ms_per_article']:>16.2f}"
+                  f"{base['links_per_sec']:>12.0f}{base['peak_kb']:>10.0f}")
+
+
+def record(urls):
+    """Fetch live pages and add them to the fixture corpus"""
+    import hashlib
+    import requests
+    from scrapper import HEADERS
+
+    with open(MANIFEST, encoding='utf-8') as f:
+        manifest = json.load(f)
+    known = {entry['url'] for entry in manifest}
+    for url, kind in urls:
+        if url in known:
+            print(f"Already recorded: {url}")
+            continue
+        response = requests.get(url, headers=HEADERS, timeout=30)
+        response.raise_for_status()
+        filename = f"{kind}-{hashlib.md5(url.encode()).hexdigest()[:10]}.html"
+        with open(os.path.join(FIXTURES_DIR, filename), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        manifest.append({'file': filename, 'kind': kind, 'url': url})
+        print(f"Recorded {url} -> {filename}")
+    with open(MANIFEST, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark article link and content extraction")
+    sub = parser.add_subparsers(dest="command")
+    rec = sub.add_parser("record", help="record live pages as fixtures")
+    rec.add_argument("--listing", action="append", default=[], help="listing page URL")
+    rec.add_argument("--article", action="append", default=[], help="article page URL")
+    parser.add_argument("--repeat", type=int, default=10, help="rounds per measurement (best is kept)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--counts-only", action="store_true",
+                        help="with --save-baseline, keep only the machine-independent counts")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed relative slowdown")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record([(u, 'listing') for u in args.listing] + [(u, 'article') for u in args.article])
+        return 0
+
+    # Per-field extractor logs are DEBUG; this also keeps INFO lines, such as
+    # app.py's notice for articles not from today or yesterday, out of the timings
+    logging.disable(logging.INFO)
+    results = run_benchmarks(args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        print(f"Baseline {args.baseline} not found; run with --save-baseline to create it", file=sys.stderr)
+        return 2
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, baseline)
+
+    if args.save_baseline:
+        if args.counts_only:
+            results = {key: {metric: values[metric] for metric in COUNT_METRICS} for key, values in results.items()}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    if baseline:
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
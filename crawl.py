@@ -0,0 +1,94 @@
+# ======================= concurrent per-site crawl scheduler ===============
+#
+# Every site is crawled by its own thread, which applies that site's
+# politeness limits (request delay, fetch concurrency), so adding a source
+# adds no serial crawl time: a run takes as long as its slowest site. The
+# threads hand (site, link, article) results to one consumer through a bounded
+# queue, and the consumer can stop a site once it has collected enough.
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAX_PENDING = 32  # results waiting for the consumer before site threads block
+
+_DONE = object()
+
+
+class SiteCrawler:
+    """Run crawl_site(site) for every site concurrently and merge their results
+
+    crawl_site must return an iterable of (link, article) pairs; if it is a
+    generator it is closed when the site is stopped.
+    """
+
+    def __init__(self, sites, crawl_site, max_pending=MAX_PENDING):
+        self.sites = list(sites)
+        self.crawl_site = crawl_site
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stops = {site.name: threading.Event() for site in self.sites}
+        self._threads = []
+
+    def _put(self, item, stop):
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                if stop.is_set():
+                    return False
+
+    def _run(self, site):
+        stop = self._stops[site.name]
+        items = None
+        try:
+            items = self.crawl_site(site)
+            for link, article in items:
+                if stop.is_set() or not self._put((site, link, article), stop):
+                    break
+        except Exception as e:
+            logger.error(f"Error crawling {site.name}: {e}", exc_info=True)
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+            self._queue.put((site, _DONE, None))
+
+    def start(self):
+        for site in self.sites:
+            thread = threading.Thread(target=self._run, args=(site,), name=f"crawl-{site.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def results(self):
+        """Yield (site, link, article) from all sites until every site is finished"""
+        if not self._threads:
+            self.start()
+        running = len(self._threads)
+        while running:
+            site, link, article = self._queue.get()
+            if link is _DONE:
+                running -= 1
+                continue
+            if self.stopped(site):
+                continue
+            yield site, link, article
+
+    def stop(self, site):
+        self._stops[site.name].set()
+
+    def stopped(self, site):
+        return self._stops[site.name].is_set()
+
+    def close(self):
+        """Stop every site and wait for their threads, discarding unread results"""
+        for stop in self._stops.values():
+            stop.set()
+        for thread in self._threads:
+            while thread.is_alive():
+                try:
+                    while True:
+                        self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                thread.join(0.1)
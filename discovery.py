@@ -0,0 +1,238 @@
+# ======================= sitemap / RSS link discovery ===============
+#
+# Instead of crawling category pages, read the site's XML feeds: sitemaps
+# listed in robots.txt (news sitemaps and sitemap indexes included) and any
+# RSS/Atom feeds in SCRAPER_FEED_URLS. Feeds are fetched with conditional GETs
+# and parsed as a stream with iterparse, so a run costs a few small requests.
+#
+# Each feed keeps a watermark: entries whose lastmod/pubDate is at or before
+# it were all stored in earlier runs. After a run the watermark moves up to
+# just below the oldest entry that is still not stored, so entries left over
+# when a run stops at MIN_ARTICLES are offered again next time. Entries older
+# than DISCOVERY_MAX_AGE are ignored either way.
+import email.utils
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+
+import requests
+import urllib3
+
+import metrics
+import upstream
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_MODE = os.environ.get("SCRAPER_DISCOVERY", "auto")  # auto: feeds, else HTML | feeds | html
+# Feed URLs for the default site, replacing the robots.txt sitemaps
+FEED_URLS = [url.strip() for url in os.environ.get("SCRAPER_FEED_URLS", "").split(",") if url.strip()]
+DISCOVERY_STATE_FILE = "output/discovery_state_{site}.json"
+DISCOVERY_MAX_AGE = float(os.environ.get("DISCOVERY_MAX_AGE", str(2 * 24 * 60 * 60)))  # seconds
+MAX_CHILD_SITEMAPS = 3      # newest sitemaps read from a sitemap index
+ROBOTS_TTL = 24 * 60 * 60   # how long the sitemap list from robots.txt is reused
+ENTRY_TAGS = ('url', 'sitemap', 'item', 'entry')
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_timestamp(value):
+    """Parse a W3C datetime (sitemaps, Atom) or RFC 822 date (RSS) into epoch seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iter_feed_entries(stream):
+    """Yield (kind, url, modified) from a sitemap, sitemap index, RSS or Atom document
+
+    kind is 'sitemap' for entries of a sitemap index and 'page' otherwise.
+    Elements are cleared as soon as they are read, so memory stays flat.
+    """
+    fields = {}
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        name = _local(elem.tag)
+        if event == 'start':
+            if name in ENTRY_TAGS:
+                fields = {}
+            continue
+        text = (elem.text or '').strip()
+        if name == 'loc' or (name == 'link' and text):
+            fields.setdefault('url', text)
+        elif name == 'link' and elem.get('href') and elem.get('rel', 'alternate') == 'alternate':
+            fields.setdefault('url', elem.get('href'))
+        elif name in ('lastmod', 'publication_date', 'pubDate', 'updated', 'published', 'date'):
+            fields.setdefault('modified', parse_timestamp(text))
+        elif name in ENTRY_TAGS:
+            if fields.get('url'):
+                yield ('sitemap' if name == 'sitemap' else 'page'), fields['url'], fields.get('modified')
+            fields = {}
+            elem.clear()
+
+
+class FeedDiscovery:
+    """Find new article URLs from the site's sitemaps and feeds"""
+
+    def __init__(self, site_url, headers, feed_urls=None, state_path=None,
+                 max_age=DISCOVERY_MAX_AGE, timeout=30):
+        self.site_url = site_url
+        self.site_host = urlparse(site_url).netloc
+        self.headers = headers
+        self.feed_urls = list(feed_urls or [])
+        self.state_path = state_path or DISCOVERY_STATE_FILE.format(site=self.site_host.replace(':', '_'))
+        self.max_age = max_age
+        self.timeout = timeout
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'robots': None, 'feeds': {}}
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.state_path)
+
+    def sitemaps_from_robots(self):
+        """Sitemap URLs declared in robots.txt, cached for ROBOTS_TTL"""
+        cached = self.state.get('robots')
+        if cached and time.time() - cached['fetched_at'] < ROBOTS_TTL:
+            return cached['sitemaps']
+        response, content, encoding = upstream.get_body(urljoin(self.site_url, "/robots.txt"),
+                                                        headers=self.headers, timeout=self.timeout)
+        sitemaps = []
+        if response.status_code == 200:
+            for line in content.decode(encoding, errors='replace').splitlines():
+                key, _, value = line.partition(':')
+                if key.strip().lower() == 'sitemap' and value.strip():
+                    sitemaps.append(value.strip())
+        self.state['robots'] = {'fetched_at': time.time(), 'sitemaps': sitemaps}
+        return sitemaps
+
+    def feeds(self):
+        if self.feed_urls:
+            return self.feed_urls
+        try:
+            return self.sitemaps_from_robots()
+        except requests.RequestException as e:
+            logger.warning(f"Could not read robots.txt: {e}")
+            return []
+
+    def fetch_feed(self, url):
+        """Conditionally fetch and stream-parse one feed
+
+        Returns a list of (kind, url, modified), or None when the feed is
+        unchanged since the last fetch (HTTP 304).
+        """
+        feed_state = self.state['feeds'].setdefault(url, {})
+        headers = dict(self.headers)
+        if feed_state.get('etag'):
+            headers['If-None-Match'] = feed_state['etag']
+        if feed_state.get('last_modified'):
+            headers['If-Modified-Since'] = feed_state['last_modified']
+
+        with metrics.stage('discovery_fetch') as timer:
+            response = upstream.get(url, headers=headers, timeout=self.timeout, stream=True)
+            try:
+                if response.status_code == 304 or not response.ok:
+                    upstream.body_read(response)  # the host answered; there is no body to read
+                if response.status_code == 304:
+                    return None
+                response.raise_for_status()
+                response.raw.decode_content = True
+                read_start = time.perf_counter()
+                try:
+                    entries = list(iter_feed_entries(response.raw))
+                except (OSError, urllib3.exceptions.HTTPError) as e:
+                    # A stall or reset mid-body counts against the host
+                    upstream.body_read(response, e, time.perf_counter() - read_start)
+                    raise
+                upstream.body_read(response)
+                timer.bytes = response.raw.tell()
+            finally:
+                response.close()
+        feed_state['etag'] = response.headers.get('ETag')
+        feed_state['last_modified'] = response.headers.get('Last-Modified')
+        return entries
+
+    def _page_candidates(self, url, entries, known_urls, cutoff):
+        """New pages of one feed, updating its watermark and pending list"""
+        feed_state = self.state['feeds'].setdefault(url, {})
+        if entries is None:  # unchanged: only what was left over last time
+            entries = [('page', link, modified) for link, modified in feed_state.get('pending', [])]
+        watermark = feed_state.get('watermark') or 0
+
+        newest = watermark
+        pending = []
+        for kind, link, modified in entries:
+            if kind != 'page' or urlparse(link).netloc != self.site_host:
+                continue
+            if modified is not None:
+                if modified <= watermark or modified < cutoff:
+                    continue
+                newest = max(newest, modified)
+            if link not in known_urls:
+                pending.append((link, modified))
+
+        dated = [modified for _, modified in pending if modified is not None]
+        feed_state['watermark'] = min(dated) - 0.001 if dated else newest
+        feed_state['pending'] = pending
+        return pending
+
+    def discover(self, known_urls, save_state=True):
+        """Return new article URLs, newest first, or None if no feed could be read"""
+        cutoff = time.time() - self.max_age
+        candidates = {}
+        readable = 0
+        queue = [(url, 0) for url in self.feeds()]
+        while queue:
+            url, depth = queue.pop(0)
+            try:
+                entries = self.fetch_feed(url)
+            except (requests.RequestException, ET.ParseError) as e:
+                logger.warning(f"Could not read feed {url}: {e}")
+                continue
+            readable += 1
+            feed_state = self.state['feeds'][url]
+            is_index = bool(entries) and any(kind == 'sitemap' for kind, _, _ in entries)
+            if is_index and depth == 0:
+                # Sitemap index: remember its newest child sitemaps
+                children = sorted((e for e in entries if e[0] == 'sitemap' and (e[2] is None or e[2] >= cutoff)),
+                                  key=lambda e: e[2] or 0, reverse=True)
+                feed_state['children'] = [child_url for _, child_url, _ in children[:MAX_CHILD_SITEMAPS]]
+            if feed_state.get('children') and (is_index or entries is None):
+                # Follow the children even when the index itself is unchanged
+                queue.extend((child_url, 1) for child_url in feed_state['children'])
+                continue
+            for link, modified in self._page_candidates(url, entries, known_urls, cutoff):
+                candidates[link] = max(candidates.get(link) or 0, modified or 0)
+
+        try:
+            if save_state:
+                self.save_state()
+        except OSError as e:
+            logger.error(f"Could not save discovery state: {e}")
+        if not readable:
+            return None
+        links = sorted(candidates, key=candidates.get, reverse=True)
+        logger.info(f"Discovered {len(links)} new article links from {readable} feeds")
+        return links
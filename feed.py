@@ -0,0 +1,143 @@
+# ======================= new-article event feed (SSE) ===============
+#
+# Event ids come from the article's scraped_at (milliseconds since the epoch,
+# bumped by one when two articles share a second), not from a per-process
+# counter. Every gunicorn worker reads the same store, so they all give an
+# article the same id, and a client can resume with Last-Event-ID on any
+# worker, including one started after the client's last connection.
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pytz
+
+from store import ArticleRecord, SCRAPED_AT_FORMAT
+
+FEED_REPLAY_SIZE = 500        # events kept for Last-Event-ID resume
+FEED_HEARTBEAT_SECONDS = 15   # keep-alive comment interval for idle streams
+FEED_RETRY_MS = 5000          # client reconnect delay sent in the stream
+FEED_MAX_ID_SKEW_MS = 24 * 3600 * 1000  # ids further ahead of the clock than this are not ours
+
+BD_TZ = pytz.timezone('Asia/Dhaka')
+
+
+def article_event_id(article):
+    """Millisecond timestamp of the article's scraped_at, or 0 if it has none"""
+    scraped = article.scraped if isinstance(article, ArticleRecord) else None
+    if scraped is None:
+        try:
+            scraped = datetime.strptime(article.get('scraped_at') or '', SCRAPED_AT_FORMAT)
+        except ValueError:
+            return 0
+    return int(BD_TZ.localize(scraped).timestamp() * 1000)
+
+
+class ArticleFeed:
+    """Bounded, append-only buffer of new-article events shared by all subscribers
+
+    Subscribers do not get their own queue: each one only remembers the id of the
+    last event it sent and waits on a single shared condition, so an idle client
+    costs one blocked thread and nothing else. Buffered articles are kept as
+    compact ArticleRecords and turned back into dicts as they are sent.
+    """
+
+    def __init__(self, maxlen=FEED_REPLAY_SIZE):
+        self._events = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._last_id = 0
+        self._seen_urls = set()
+        self.closed = False
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, article):
+        """Append an article event, ignoring URLs that were already published"""
+        url = article.get('url')
+        with self._cond:
+            if url in self._seen_urls:
+                return None
+            self._seen_urls.add(url)
+            if len(self._seen_urls) > self._events.maxlen * 4:
+                # Forget URLs that can no longer be replayed
+                self._seen_urls = {event[1].get('url') for event in self._events}
+                self._seen_urls.add(url)
+            self._last_id = max(self._last_id + 1, article_event_id(article))
+            self._events.append((self._last_id, ArticleRecord.from_article(article)))
+            self._cond.notify_all()
+            return self._last_id
+
+    def events_after(self, last_event_id):
+        """Return buffered events newer than last_event_id, oldest first"""
+        with self._cond:
+            return self._events_after(last_event_id)
+
+    def _events_after(self, last_event_id):
+        # Ids are increasing but not contiguous; a client further behind than
+        # the replay buffer simply gets all of it
+        if not self._events or last_event_id >= self._last_id:
+            return []
+        events = []
+        for event in reversed(self._events):
+            if event[0] <= last_event_id:
+                break
+            events.append(event)
+        return events[::-1]
+
+    def resume_id(self, last_event_id):
+        """Cursor to resume a client from: None means "from now", a foreign id replays the buffer"""
+        if last_event_id is None:
+            return self._last_id
+        if last_event_id > max(self._last_id, time.time() * 1000 + FEED_MAX_ID_SKEW_MS):
+            # Not an id this feed could ever produce (e.g. an old per-process counter)
+            return 0
+        return last_event_id
+
+    def wait(self, last_event_id, timeout):
+        """Block until an event newer than last_event_id exists or timeout expires"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.closed or self._last_id > last_event_id, timeout=timeout)
+            return self._events_after(last_event_id)
+
+    def close(self):
+        """End all open streams, e.g. when the server is shutting down"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stream(self, last_event_id=None, heartbeat=FEED_HEARTBEAT_SECONDS):
+        """Yield Server-Sent Events text chunks, resuming after last_event_id"""
+        cursor = self.resume_id(last_event_id)
+        yield f"retry: {FEED_RETRY_MS}\n\n"
+        while not self.closed:
+            events = self.wait(cursor, heartbeat)
+            if self.closed:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, article in events:
+                cursor = event_id
+                yield format_event(event_id, 'article', article)
+
+
+def format_event(event_id, event_type, data):
+    """Format a single Server-Sent Event"""
+    if isinstance(data, ArticleRecord):
+        data = data.to_dict()
+    payload = json.dumps(data, ensure_ascii=False)
+    lines = "".join(f"data: {line}\n" for line in payload.splitlines() or [""])
+    return f"id: {event_id}\nevent: {event_type}\n{lines}\n"
+
+
+def parse_last_event_id(value):
+    """Parse a Last-Event-ID header value, returning None when absent or invalid"""
+    if value is None:
+        return None
+    try:
+        return max(int(value.strip()), 0)
+    except ValueError:
+        return None
@@ -0,0 +1,59 @@
+# ======================= production server config ===============
+# Run with:  gunicorn -c gunicorn.conf.py app:app
+#
+# Every setting can be overridden from the environment so the same file works
+# on a laptop and on the deployment host.
+import multiprocessing
+import os
+import signal
+
+bind = os.environ.get("BIND", f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+
+# Worker processes share the article snapshot through mmap, so adding workers
+# costs little memory. Threads serve slow clients and open /articles/stream
+# connections without blocking each other. Each stream holds a thread, so a
+# worker accepts at most MAX_STREAMS_PER_WORKER (default half the threads) and
+# answers 503 with a retry hint beyond that. For thousands of subscribers run
+# an async worker class instead (GUNICORN_WORKER_CLASS=gevent, with gevent
+# installed) and raise MAX_STREAMS_PER_WORKER.
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "64"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+backlog = int(os.environ.get("GUNICORN_BACKLOG", "2048"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers now and then to cap slow leaks from parser libraries
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    # Warm the article cache before the worker accepts requests so /ready
+    # reflects real state and the first client doesn't pay for the load
+    from app import article_feed, article_store, start_store_watcher
+    article_store.refresh()
+    start_store_watcher()
+    worker.log.info(f"Worker {worker.pid} ready with {len(article_store)} articles")
+
+    # End open SSE streams on SIGTERM so graceful shutdown doesn't wait out
+    # graceful_timeout on idle subscribers
+    handle_exit = worker.handle_exit
+
+    def close_streams_and_exit(sig, frame):
+        article_feed.close()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, close_streams_and_exit)
+
+
+def worker_int(worker):
+    from app import article_feed
+    article_feed.close()
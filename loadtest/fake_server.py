@@ -0,0 +1,293 @@
+# ======================= local stand-in for dhakapost.com ===============
+#
+#   python loadtest/fake_server.py --port 8081 --latency 0.05 --error-rate 0.02 --pages 5
+#
+# Serves Dhaka Post-shaped listing pages (/<category>?page=N), article pages
+# (/<category>/<id>) and images (/media/<id>.jpg), plus robots.txt, a sitemap
+# index, a news sitemap and an RSS feed listing the same articles (--no-feeds
+# turns those off to exercise the HTML fallback). Pages are generated from
+# the article id so every run sees the same site, or taken from the recorded
+# benchmark fixtures with --fixtures.
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+CATEGORIES = ['latest-news', 'bangladesh', 'world', 'sports', 'entertainment']
+ARTICLE_CATEGORIES = ['bangladesh', 'world', 'sports', 'entertainment']
+WORDS = ("ঢাকা বাংলাদেশ সরকার নির্বাচন কমিশন আদালত পুলিশ শিক্ষার্থী বিশ্ববিদ্যালয় অর্থনীতি বাজার "
+         "দাম বৃষ্টি বন্যা আবহাওয়া ক্রিকেট দল খেলা ম্যাচ চলচ্চিত্র শিল্পী বিশ্ব বৈঠক আলোচনা "
+         "সিদ্ধান্ত প্রকল্প উন্নয়ন সড়ক সেতু মেট্রোরেল স্বাস্থ্য হাসপাতাল চিকিৎসা").split()
+
+ARTICLE_PATH = re.compile(r'^/([a-z-]+)/(\d+)$')
+IMAGE_PATH = re.compile(r'^/media/(\d+)\.jpg$')
+# 1x1 JPEG-ish payload padded to a realistic size
+IMAGE_BYTES = b'\xff\xd8\xff\xe0' + bytes(range(256)) * 160 + b'\xff\xd9'
+
+
+class SiteConfig:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, pages=3, per_page=20,
+                 paragraphs=12, fixtures=False, seed=1, feeds=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pages = pages
+        self.per_page = per_page
+        self.paragraphs = paragraphs
+        self.fixtures = load_fixtures() if fixtures else None
+        self.seed = seed
+        self.feeds = feeds
+        self.started = time.time()
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.errors = 0
+
+    def count(self, kind, error=False):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': dict(self.requests), 'errors': self.errors}
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, "manifest.json"), encoding='utf-8') as f:
+        manifest = json.load(f)
+    pages = {'listing': [], 'article': []}
+    for entry in manifest:
+        with open(os.path.join(FIXTURES_DIR, entry['file']), encoding='utf-8') as f:
+            html = f.read()
+        # Point absolute site links back at this server
+        html = re.sub(r'https?://(www\.)?dhakapost\.com', '', html)
+        pages[entry['kind']].append(html)
+    return pages
+
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)) + "।"
+
+
+def page_shell(title, body):
+    nav = "".join(f'<li><a href="/{c}">{c}</a></li>' for c in CATEGORIES)
+    return (f'<!DOCTYPE html><html lang="bn"><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body><header><a class="logo" href="/"><img src="/assets/logo.svg"></a><nav><ul>{nav}</ul></nav></header>'
+            f'<main>{body}</main><footer><p>© ঢাকা পোস্ট</p></footer></body></html>')
+
+
+def listing_page(config, category, page):
+    rng = random.Random(f"{config.seed}:{category}:{page}")
+    cards = []
+    for i in range(config.per_page):
+        article_category = category if category in ARTICLE_CATEGORIES else rng.choice(ARTICLE_CATEGORIES)
+        article_id = 100000 + (page - 1) * config.per_page + i + CATEGORIES.index(category) * 10000
+        cards.append(f'<div class="news-item"><a href="/{article_category}/{article_id}">'
+                     f'<img data-src="/media/{article_id}.jpg"><h3 class="title">{sentence(rng, 7)}</h3></a></div>')
+    pagination = "".join(f'<a href="?page={n}">{n}</a>' for n in range(1, config.pages + 1))
+    body = f'<div class="news-list">{"".join(cards)}</div><div class="pagination">{pagination}</div>'
+    return page_shell(category, body)
+
+
+def article_page(config, category, article_id):
+    rng = random.Random(f"{config.seed}:{article_id}")
+    paragraphs = "".join(f"<p>{sentence(rng, rng.randint(20, 40))}</p>" for _ in range(config.paragraphs))
+    body = (f'<article class="news-details"><h1 class="article-title">{sentence(rng, 8)}</h1>'
+            f'<span class="author">নিজস্ব প্রতিবেদক</span>'
+            f'<time datetime="{time.strftime("%Y-%m-%dT%H:%M:%S")}">আজ</time>'
+            f'<img src="/media/{article_id}.jpg" width="800" height="450">'
+            f'<div class="article-body">{paragraphs}</div></article>')
+    return page_shell(category, body)
+
+
+def listed_articles(config):
+    """(category, id, published) for every article on the listing pages, newest first"""
+    entries = []
+    for category in ARTICLE_CATEGORIES:
+        for page in range(1, config.pages + 1):
+            for i in range(config.per_page):
+                article_id = 100000 + (page - 1) * config.per_page + i + CATEGORIES.index(category) * 10000
+                rank = (page - 1) * config.per_page + i
+                entries.append((category, article_id, config.started - rank * 300))
+    return sorted(entries, key=lambda e: e[2], reverse=True)
+
+
+def robots_txt(base):
+    return f"User-agent: *\nAllow: /\nSitemap: {base}/sitemap.xml\n"
+
+
+def sitemap_index(config, base):
+    lastmod = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(config.started))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            f'<sitemap><loc>{base}/sitemap-news.xml</loc><lastmod>{lastmod}</lastmod></sitemap>'
+            '</sitemapindex>')
+
+
+def news_sitemap(config, base):
+    urls = "".join(
+        f'<url><loc>{base}/{category}/{article_id}</loc>'
+        f'<lastmod>{time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(published))}</lastmod></url>'
+        for category, article_id, published in listed_articles(config))
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>')
+
+
+def rss_feed(config, base):
+    items = "".join(
+        f'<item><title>{article_id}</title><link>{base}/{category}/{article_id}</link>'
+        f'<pubDate>{formatdate(published, usegmt=True)}</pubDate></item>'
+        for category, article_id, published in listed_articles(config)[:50])
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f'<title>Dhaka Post</title><link>{base}/</link>{items}</channel></rss>')
+
+
+FEEDS = {
+    '/robots.txt': lambda config, base: robots_txt(base),
+    '/sitemap.xml': sitemap_index,
+    '/sitemap-news.xml': news_sitemap,
+    '/rss.xml': rss_feed,
+}
+
+
+def make_handler(config, stats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            path = parsed.path.rstrip('/') or '/'
+
+            delay = config.latency + random.uniform(0, config.jitter)
+            if delay:
+                time.sleep(delay)
+
+            if config.error_rate and random.random() < config.error_rate:
+                stats.count('error', error=True)
+                return self.send(503, b"Service Unavailable", "text/plain")
+
+            match = IMAGE_PATH.match(path)
+            if match:
+                stats.count('image')
+                return self.send(200, IMAGE_BYTES, "image/jpeg")
+
+            match = ARTICLE_PATH.match(path)
+            if match and match.group(1) in CATEGORIES:
+                stats.count('article')
+                if config.fixtures:
+                    fixtures = config.fixtures['article']
+                    html = fixtures[int(match.group(2)) % len(fixtures)]
+                else:
+                    html = article_page(config, match.group(1), int(match.group(2)))
+                return self.send(200, html.encode('utf-8'), "text/html; charset=utf-8")
+
+            category = path.lstrip('/')
+            if category in CATEGORIES:
+                page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+                if page > config.pages:
+                    stats.count('listing_miss')
+                    return self.send(404, b"Not Found", "text/plain")
+                stats.count('listing')
+                if config.fixtures:
+                    fixtures = config.fixtures['listing']
+                    html = fixtures[(page - 1) % len(fixtures)]
+                else:
+                    html = listing_page(config, category, page)
+                return self.send(200, html.encode('utf-8'), "text/html; charset=utf-8")
+
+            if config.feeds and path in FEEDS:
+                stats.count('feed')
+                base = f"http://{self.headers.get('Host')}"
+                body, content_type = FEEDS[path](config, base), "application/xml"
+                if path == '/robots.txt':
+                    content_type = "text/plain"
+                return self.send_cacheable(body.encode('utf-8'), content_type)
+
+            stats.count('not_found')
+            return self.send(404, b"Not Found", "text/plain")
+
+        def send_cacheable(self, body, content_type):
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send(200, body, content_type, {"ETag": etag})
+
+        def send(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def start_server(config, host="127.0.0.1", port=0):
+    """Start the fake site in a background thread; returns (server, stats, base_url)"""
+    stats = Stats()
+    server = ThreadingHTTPServer((host, port), make_handler(config, stats))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-news-server", daemon=True).start()
+    return server, stats, f"http://{host}:{server.server_address[1]}"
+
+
+def add_site_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0, help="base response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--pages", type=int, default=3, help="pagination depth per category")
+    parser.add_argument("--per-page", type=int, default=20, help="article links per listing page")
+    parser.add_argument("--fixtures", action="store_true", help="serve recorded benchmark fixtures")
+    parser.add_argument("--no-feeds", dest="feeds", action="store_false",
+                        help="serve no robots.txt, sitemaps or RSS (forces HTML discovery)")
+
+
+def site_config(args):
+    return SiteConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      pages=args.pages, per_page=args.per_page, fixtures=args.fixtures, feeds=args.feeds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Dhaka Post site for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_site_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server, stats, base_url = start_server(site_config(args), args.host, args.port)
+    print(f"Fake news site on {base_url} (set DHAKAPOST_URL={base_url})")
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(stats.snapshot()))
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
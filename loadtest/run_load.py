@@ -0,0 +1,177 @@
+# ======================= end-to-end load driver ===============
+#
+#   python loadtest/run_load.py crawl --latency 0.05 --pages 5 --min-articles 100
+#   python loadtest/run_load.py api --clients 200 --duration 30
+#   python loadtest/run_load.py api --empty-store          # every /articles call scrapes live
+#   python loadtest/run_load.py api --target http://127.0.0.1:5000   # hit an already running server
+#
+# Starts the fake news site, points app.py / scrapper.py at it through
+# DHAKAPOST_URL and runs inside a scratch directory so the real output/ and
+# images/ are never touched.
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_server import add_site_arguments, site_config, start_server  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def latency_summary(latencies_ms):
+    values = sorted(latencies_ms)
+    return {
+        'p50_ms': round(percentile(values, 50), 2),
+        'p95_ms': round(percentile(values, 95), 2),
+        'p99_ms': round(percentile(values, 99), 2),
+        'max_ms': round(values[-1], 2) if values else 0.0,
+    }
+
+
+def prepare_environment(base_url, args):
+    """Point the scraper and API at the fake site and move into a scratch directory"""
+    os.environ['DHAKAPOST_URL'] = base_url
+    os.environ['SCRAPER_REQUEST_DELAY'] = str(args.request_delay)
+    if getattr(args, 'min_articles', None):
+        os.environ['SCRAPER_MIN_ARTICLES'] = str(args.min_articles)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="dhakapost-load-")
+    os.makedirs(os.path.join(workdir, "output"), exist_ok=True)
+    os.makedirs(os.path.join(workdir, "images"), exist_ok=True)
+    os.chdir(workdir)
+    return workdir
+
+
+def run_crawl(stats):
+    """Run one full scraper pass and report how long it took"""
+    import scrapper
+
+    before = stats.snapshot()
+    start = time.perf_counter()
+    scrapper.run_scraper()
+    elapsed = time.perf_counter() - start
+    after = stats.snapshot()
+
+    requests_made = {k: v - before['requests'].get(k, 0) for k, v in after['requests'].items()}
+    scrapper.article_store.refresh()
+    stored = len(scrapper.article_store)
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'articles_stored': stored,
+        'articles_per_sec': round(stored / elapsed, 2) if elapsed else 0.0,
+        'upstream_requests': requests_made,
+        'upstream_errors': after['errors'] - before['errors'],
+    }
+
+
+def start_api():
+    """Serve app.py from a threaded werkzeug server in this process"""
+    from werkzeug.serving import make_server
+    import app
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="api-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def drive_api(target, path, clients, duration, timeout):
+    """Hammer target+path from `clients` threads for `duration` seconds"""
+    import requests
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        local_latencies = []
+        local_statuses = {}
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = session.get(f"{target}{path}", timeout=timeout).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = {
+        'clients': clients,
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'statuses': {str(k): v for k, v in statuses.items()},
+    }
+    result.update(latency_summary(latencies))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the scraper and API against a fake news site")
+    parser.add_argument("mode", choices=["crawl", "api", "all"])
+    add_site_arguments(parser)
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--request-delay", type=float, default=0.0, help="scraper politeness delay")
+    parser.add_argument("--min-articles", type=int, help="articles the scraper collects per run")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent API clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="API test length in seconds")
+    parser.add_argument("--path", default="/articles", help="API path to request")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client request timeout")
+    parser.add_argument("--target", help="base URL of an already running API server")
+    parser.add_argument("--empty-store", action="store_true", help="skip the warm-up crawl for the API test")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.INFO)
+
+    site, stats, base_url = start_server(site_config(args))
+    workdir = prepare_environment(base_url, args)
+    report = {'site': base_url, 'workdir': workdir}
+
+    if args.mode in ("crawl", "all") or (args.mode == "api" and not args.empty_store and not args.target):
+        report['crawl'] = run_crawl(stats)
+
+    if args.mode in ("api", "all"):
+        target = args.target
+        api_server = None
+        if not target:
+            api_server, target = start_api()
+        report['api'] = drive_api(target, args.path, args.clients, args.duration, args.timeout)
+        report['api']['target'] = target
+        if api_server:
+            api_server.shutdown()
+
+    report['upstream'] = stats.snapshot()
+    site.shutdown()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# ======================= non-blocking structured logging ===============
+#
+# Log calls only build a LogRecord and push it onto an in-memory queue. A
+# single listener thread does the formatting (including tracebacks), JSON
+# encoding and file/console I/O, so none of that runs in the fetch/parse loops.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_RATE_LIMIT = int(os.environ.get("LOG_RATE_LIMIT", "20"))             # records per call site...
+LOG_RATE_INTERVAL = float(os.environ.get("LOG_RATE_INTERVAL", "60"))     # ...per this many seconds
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Standard LogRecord attributes; anything else was passed via extra= and is kept
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'where': f"{record.module}:{record.lineno}",
+            'thread': record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let through at most `rate` records per call site every `interval` seconds
+
+    Records at ERROR and above are never dropped. The next record that passes
+    from a throttled call site carries a `suppressed` count.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT, interval=LOG_RATE_INTERVAL, exempt_level=logging.ERROR):
+        super().__init__()
+        self.rate = rate
+        self.interval = interval
+        self.exempt_level = exempt_level
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= self.exempt_level:
+            return True
+        with self._lock:
+            return self._allow(record)
+
+    def _allow(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if window[1] < self.rate:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock prepare() formats the message and traceback in the calling
+    thread so records can be pickled; our queue never leaves the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(log_file=None, level=LOG_LEVEL, json_file=True, console=True):
+    """Route the root logger through a queue to console and/or a rotating log file"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        handlers = []
+        if console:
+            stream = logging.StreamHandler(sys.stdout)
+            stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(stream)
+        if log_file:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+            file_handler.setFormatter(JsonFormatter() if json_file else logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(file_handler)
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(RateLimitFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,255 @@
+# ======================= per-stage scraper metrics (Prometheus text format) ===============
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGES = ('discovery_fetch', 'listing_fetch', 'listing_parse', 'article_fetch', 'article_parse',
+          'image_download', 'store_write', 'snapshot_write', 'parquet_export', 'revisit_fetch')
+
+SCRAPER_METRICS_FILE = "output/scraper_metrics.prom"
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        key = tuple(str(v) for v in labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(tuple(str(v) for v in labelvalues), 0)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        key = tuple(str(v) for v in labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def items(self):
+        with self._lock:
+            return [(key, list(series)) for key, series in self._series.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ('le',), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def counter_totals(self):
+        """Current value of every counter series, keyed by (metric name, label values)"""
+        return {(metric.name, key): value for metric in self._metrics if isinstance(metric, Counter)
+                for key, value in metric.items()}
+
+    def counter_deltas(self, before):
+        """(name, label values, amount) for every counter that grew since counter_totals() returned before"""
+        return [(name, key, value - before.get((name, key), 0))
+                for (name, key), value in self.counter_totals().items() if value != before.get((name, key), 0)]
+
+    def apply_counter_deltas(self, deltas):
+        """Add counts recorded in another process (see counter_deltas) to this registry"""
+        counters = {metric.name: metric for metric in self._metrics if isinstance(metric, Counter)}
+        for name, key, amount in deltas:
+            if name in counters:
+                counters[name].inc(*key, amount=amount)
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    'scraper_stage_duration_seconds', 'Time spent in each scraper stage', ['stage'])
+STAGE_BYTES = REGISTRY.counter(
+    'scraper_stage_bytes_total', 'Bytes fetched or written by each scraper stage', ['stage'])
+STAGE_ERRORS = REGISTRY.counter(
+    'scraper_stage_errors_total', 'Errors in each scraper stage by category and HTTP status',
+    ['stage', 'category', 'status'])
+NEAR_DUPLICATES = REGISTRY.counter(
+    'scraper_near_duplicates_total', 'New articles skipped as near-duplicates of a stored article')
+
+
+def classify_error(exc):
+    """Map an exception to an (error category, HTTP status) pair"""
+    import requests
+    from upstream import BodyTooLargeError, CircuitOpenError
+
+    if isinstance(exc, CircuitOpenError):
+        return 'circuit_open', ''
+    if isinstance(exc, BodyTooLargeError):
+        return 'too_large', ''
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return 'http', str(exc.response.status_code)
+    if isinstance(exc, requests.Timeout):
+        return 'timeout', ''
+    if isinstance(exc, requests.ConnectionError):
+        return 'connection', ''
+    if isinstance(exc, requests.RequestException):
+        return 'request', ''
+    if isinstance(exc, (OSError, UnicodeError)):
+        return 'io', ''
+    return 'parse', ''
+
+
+def record_error(stage_name, exc=None, category=None, status=''):
+    if exc is not None:
+        category, status = classify_error(exc)
+    STAGE_ERRORS.inc(stage_name, category or 'other', status)
+
+
+class StageTimer:
+    __slots__ = ('stage', 'bytes')
+
+    def __init__(self, stage_name):
+        self.stage = stage_name
+        self.bytes = 0
+
+
+@contextmanager
+def stage(stage_name):
+    """Time a scraper stage; set .bytes on the yielded timer to count payload size"""
+    timer = StageTimer(stage_name)
+    start = time.perf_counter()
+    try:
+        yield timer
+    except Exception as e:
+        record_error(stage_name, e)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage_name)
+        if timer.bytes:
+            STAGE_BYTES.inc(stage_name, amount=timer.bytes)
+
+
+def observe(stage_name, seconds, nbytes=0):
+    """Record a stage that was timed by the caller"""
+    STAGE_LATENCY.observe(seconds, stage_name)
+    if nbytes:
+        STAGE_BYTES.inc(stage_name, amount=nbytes)
+
+
+def stage_snapshot():
+    """Return cumulative per-stage totals, used to summarise a single run"""
+    snapshot = {}
+    for (stage_name,), series in STAGE_LATENCY.items():
+        snapshot[stage_name] = {'buckets': series[:-1], 'seconds': series[-1], 'bytes': 0, 'errors': 0}
+    empty = {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'seconds': 0.0, 'bytes': 0, 'errors': 0}
+    for (stage_name,), value in STAGE_BYTES.items():
+        snapshot.setdefault(stage_name, dict(empty))['bytes'] = value
+    for (stage_name, _, _), value in STAGE_ERRORS.items():
+        entry = snapshot.setdefault(stage_name, dict(empty))
+        entry['errors'] = entry['errors'] + value
+    return snapshot
+
+
+def _bucket_quantile(buckets, q):
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    rank = q * total
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), buckets):
+        seen += count
+        if seen >= rank:
+            return bound if bound != float('inf') else LATENCY_BUCKETS[-1]
+    return LATENCY_BUCKETS[-1]
+
+
+def format_stage_summary(before, after):
+    """Describe per-stage activity between two snapshots, one line per stage"""
+    lines = []
+    for stage_name in STAGES + tuple(sorted(set(after) - set(STAGES))):
+        now = after.get(stage_name)
+        if not now:
+            continue
+        then = before.get(stage_name) or {'buckets': [0] * len(now['buckets']), 'seconds': 0.0, 'bytes': 0, 'errors': 0}
+        buckets = [a - b for a, b in zip(now['buckets'], then['buckets'])]
+        calls = sum(buckets)
+        errors = now['errors'] - then['errors']
+        if not calls and not errors:
+            continue
+        seconds = now['seconds'] - then['seconds']
+        avg_ms = seconds / calls * 1000 if calls else 0.0
+        p95_ms = _bucket_quantile(buckets, 0.95) * 1000
+        kb = (now['bytes'] - then['bytes']) / 1024
+        lines.append(f"{stage_name:<15} {calls:>5} calls  avg {avg_ms:8.1f} ms  p95 <= {p95_ms:7.0f} ms  "
+                     f"{kb:10.1f} KB  {errors} errors")
+    return lines
+
+
+def write_textfile(path=SCRAPER_METRICS_FILE, registry=REGISTRY):
+    """Atomically write the registry in Prometheus text format for another process to serve"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
@@ -0,0 +1,212 @@
+# ======================= near-duplicate detection with SimHash ===============
+#
+# Each article body is reduced to a 64-bit SimHash over word 3-shingles:
+# similar texts get fingerprints that differ in only a few bits. The
+# fingerprints live in a growing NumPy uint64 array. For lookup the 64 bits
+# are cut into NEAR_DUP_BANDS bands; if two fingerprints are within
+# NEAR_DUP_DISTANCE bits and there are more bands than that, at least one
+# band matches exactly (pigeonhole). So only rows sharing a band value are
+# compared, with one vectorised XOR and popcount.
+import hashlib
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUP_INDEX = "output/simhash_index.npz"
+NEAR_DUP_DISTANCE = int(os.environ.get("NEAR_DUP_DISTANCE", "3"))  # max differing bits
+NEAR_DUP_BANDS = 4                                                  # must exceed NEAR_DUP_DISTANCE
+SHINGLE_SIZE = 3
+MIN_TOKENS = 20  # shorter bodies ("Content not available") are not fingerprinted
+
+def _file_ident(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+_PUNCTUATION = str.maketrans('', '', '.,;:!?"\'()[]{}“”‘’।—-')
+_BIT_WEIGHTS = np.arange(64, dtype=np.uint64)
+
+
+def tokenize(text):
+    # Whitespace split keeps Bangla words whole (\w would split at vowel signs)
+    return [token for token in text.translate(_PUNCTUATION).lower().split() if token]
+
+
+def shingle_hashes(tokens, size=SHINGLE_SIZE):
+    """64-bit hashes of the word shingles of a token list"""
+    count = max(len(tokens) - size + 1, 1)
+    digests = b"".join(
+        hashlib.blake2b(" ".join(tokens[i:i + size]).encode('utf-8'), digest_size=8).digest()
+        for i in range(count)
+    )
+    return np.frombuffer(digests, dtype='<u8')
+
+
+def simhash(text):
+    """Return the 64-bit SimHash of text, or None if it is too short to compare"""
+    tokens = tokenize(text or "")
+    if len(tokens) < MIN_TOKENS:
+        return None
+    hashes = shingle_hashes(tokens)
+    # bits[i, j] = bit j of shingle i; a fingerprint bit is set where most shingles have it set
+    bits = (hashes[:, None] >> _BIT_WEIGHTS) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(hashes)
+    return int((majority.astype(np.uint64) << _BIT_WEIGHTS).sum())
+
+
+class SimHashIndex:
+    """Fingerprints of stored articles with banded exact-match buckets"""
+
+    def __init__(self, distance=NEAR_DUP_DISTANCE, bands=NEAR_DUP_BANDS):
+        if bands <= distance:
+            raise ValueError("bands must exceed distance for banded lookup to find every match")
+        self.distance = distance
+        self.bands = bands
+        self.band_bits = 64 // bands
+        self._band_mask = (1 << self.band_bits) - 1
+        self._fingerprints = np.zeros(1024, dtype=np.uint64)
+        self._count = 0
+        self.urls = []
+        self._url_set = set()
+        self._unfingerprinted = set()  # seen, but too short to fingerprint
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self._ident = None  # the saved file as of the last load or save
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, url):
+        return url in self._url_set
+
+    def _band_keys(self, fingerprint):
+        return [(fingerprint >> (band * self.band_bits)) & self._band_mask for band in range(self.bands)]
+
+    def add(self, url, fingerprint):
+        """Index url's fingerprint; returns False if it was already seen or has none
+
+        A URL without a fingerprint (too short) is still remembered as seen,
+        so sync() does not tokenize it again on every run.
+        """
+        if url in self._url_set:
+            return False
+        if fingerprint is None:
+            with self._lock:
+                self._url_set.add(url)
+                self._unfingerprinted.add(url)
+            return False
+        with self._lock:
+            if self._count == len(self._fingerprints):
+                self._fingerprints = np.resize(self._fingerprints, max(self._count * 2, 1024))
+            row = self._count
+            self._fingerprints[row] = fingerprint
+            self._count += 1
+            self.urls.append(url)
+            self._url_set.add(url)
+            for band, key in enumerate(self._band_keys(fingerprint)):
+                self._buckets[band].setdefault(key, []).append(row)
+        return True
+
+    def _bulk_add(self, urls, fingerprints):
+        """Load a saved index: band keys are computed for all rows at once"""
+        with self._lock:
+            start = self._count
+            self._fingerprints = np.concatenate([self._fingerprints[:start], fingerprints])
+            self._count += len(fingerprints)
+            self.urls.extend(urls)
+            self._url_set.update(urls)
+            for band in range(self.bands):
+                keys = (fingerprints >> np.uint64(band * self.band_bits)) & np.uint64(self._band_mask)
+                buckets = self._buckets[band]
+                for row, key in enumerate(keys.tolist(), start):
+                    buckets.setdefault(key, []).append(row)
+
+    def find(self, fingerprint, exclude_url=None):
+        """Return (url, distance) of the closest indexed fingerprint within range, or None
+
+        exclude_url is never returned, so an article fetched again (say after
+        its store write failed) does not match its own fingerprint.
+        """
+        if fingerprint is None:
+            return None
+        with self._lock:
+            rows = set()
+            for band, key in enumerate(self._band_keys(fingerprint)):
+                rows.update(self._buckets[band].get(key, ()))
+            if exclude_url is not None:
+                rows = {row for row in rows if self.urls[row] != exclude_url}
+            if not rows:
+                return None
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            distances = np.bitwise_count(self._fingerprints[rows] ^ np.uint64(fingerprint))
+            best = int(distances.argmin())
+            if distances[best] > self.distance:
+                return None
+            return self.urls[rows[best]], int(distances[best])
+
+    def retain(self, urls):
+        """Forget every URL not in urls (a set); returns how many were dropped"""
+        with self._lock:
+            rows = [row for row, url in enumerate(self.urls) if url in urls]
+            dropped = self._count - len(rows) + len(self._unfingerprinted - urls)
+            if not dropped:
+                return 0
+            fingerprints = self._fingerprints[rows]
+            kept_urls = [self.urls[row] for row in rows]
+            self._unfingerprinted &= urls
+            self._fingerprints = np.zeros(0, dtype=np.uint64)
+            self._count = 0
+            self.urls = []
+            self._url_set = set(self._unfingerprinted)
+            self._buckets = [{} for _ in range(self.bands)]
+        self._bulk_add(kept_urls, fingerprints)
+        return dropped
+
+    def changed_on_disk(self, path=NEAR_DUP_INDEX):
+        """True if another process saved the file since this index last loaded or saved it"""
+        return _file_ident(path) != self._ident
+
+    def add_article(self, article):
+        return self.add(article['url'], simhash(article.get('content')))
+
+    def save(self, path=NEAR_DUP_INDEX):
+        with self._lock:
+            fingerprints = self._fingerprints[:self._count].copy()
+            urls = np.array(self.urls, dtype=np.str_)
+            unfingerprinted = np.array(sorted(self._unfingerprinted), dtype=np.str_)
+        tmp_path = f"{path}.tmp.{os.getpid()}.npz"
+        np.savez(tmp_path, fingerprints=fingerprints, urls=urls, unfingerprinted=unfingerprinted)
+        os.replace(tmp_path, path)
+        self._ident = _file_ident(path)
+
+    @classmethod
+    def load(cls, path=NEAR_DUP_INDEX, **kwargs):
+        index = cls(**kwargs)
+        index._ident = _file_ident(path)
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    index._bulk_add(data['urls'].tolist(), data['fingerprints'].astype(np.uint64))
+                    if 'unfingerprinted' in data:
+                        index._unfingerprinted.update(data['unfingerprinted'].tolist())
+                        index._url_set.update(index._unfingerprinted)
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not load near-duplicate index, rebuilding: {e}")
+                index = cls(**kwargs)
+                index._ident = _file_ident(path)
+        return index
+
+    def sync(self, articles):
+        """Fingerprint any stored articles the index has not seen; returns how many got a fingerprint"""
+        added = 0
+        for article in articles:
+            if article['url'] not in self._url_set and self.add_article(article):
+                added += 1
+        return added
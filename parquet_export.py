@@ -0,0 +1,239 @@
+# ======================= columnar Parquet export ===============
+#
+#   python parquet_export.py backfill       # export everything already in the CSV
+#   python parquet_export.py compact        # merge small files in every partition
+#   python parquet_export.py stats
+#
+# Articles are written as Parquet files under a hive-style layout,
+#   output/parquet/scrape_date=2025-05-14/category=Sports/part-....parquet
+# one small file per partition per scraper run, so analytics jobs can read
+# only the columns and partitions they need:
+#   pq.read_table("output/parquet", columns=["title", "category"],
+#                 filters=[("scrape_date", ">=", "2025-05-01")])
+# Partitions that collect many run files are compacted into one.
+#
+# pyarrow is optional: without it the scraper logs once and skips the export.
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+PARQUET_DIR = "output/parquet"
+PARQUET_ENABLED = os.environ.get("SCRAPER_PARQUET", "1") == "1"
+COMPACT_THRESHOLD = int(os.environ.get("PARQUET_COMPACT_THRESHOLD", "24"))  # files per partition
+COMPRESSION = "zstd"
+SCRAPED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+# part-<sequence>-...: the sequence is time.time_ns() when written, so files
+# sort oldest first; a compacted file takes the sequence of the newest file it merged
+_SEQUENCE = re.compile(r'^part-(\d{19,})-')
+
+_pyarrow = None
+_warned_missing = False
+
+
+def load_pyarrow():
+    """Import pyarrow on first use; returns (pyarrow, pyarrow.parquet) or None if not installed"""
+    global _pyarrow, _warned_missing
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            if not _warned_missing:
+                logger.info("pyarrow is not installed; skipping Parquet export")
+                _warned_missing = True
+            return None
+        _pyarrow = (pyarrow, pyarrow.parquet)
+    return _pyarrow
+
+
+def article_schema(pa):
+    # scrape_date and category come from the partition directories
+    return pa.schema([
+        ('url', pa.string()),
+        ('title', pa.string()),
+        ('date', pa.string()),
+        ('author', pa.string()),
+        ('scraped_at', pa.timestamp('s', tz='Asia/Dhaka')),
+        ('images', pa.list_(pa.string())),
+        ('local_images', pa.list_(pa.string())),
+        ('content', pa.string()),
+    ])
+
+
+def partition_key(article):
+    """(scrape_date, category) for an article in the unified schema"""
+    scraped_at = article.get('scraped_at') or ''
+    scrape_date = scraped_at[:10] if len(scraped_at) >= 10 else 'unknown'
+    return scrape_date, article.get('category') or 'General'
+
+
+def partition_path(directory, scrape_date, category):
+    return os.path.join(directory, f"scrape_date={quote(scrape_date, safe='-')}",
+                        f"category={quote(category, safe='-_')}")
+
+
+def _parse_scraped_at(value):
+    import pytz
+
+    try:
+        return pytz.timezone('Asia/Dhaka').localize(datetime.strptime(value, SCRAPED_AT_FORMAT))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_table(pa, articles):
+    columns = {
+        'url': [a['url'] for a in articles],
+        'title': [a['title'] for a in articles],
+        'date': [a.get('date', '') for a in articles],
+        'author': [a.get('author', 'Unknown') for a in articles],
+        'scraped_at': [_parse_scraped_at(a.get('scraped_at')) for a in articles],
+        'images': [list(a.get('images', [])) for a in articles],
+        'local_images': [list(a.get('local_images', [])) for a in articles],
+        'content': [a['content'] for a in articles],
+    }
+    return pa.table(columns, schema=article_schema(pa))
+
+
+def _file_sequence(path):
+    match = _SEQUENCE.match(os.path.basename(path))
+    if match:
+        return int(match.group(1))
+    # Files named before sequences were used: their mtime is in the same unit
+    return os.stat(path).st_mtime_ns
+
+
+def _part_files(path):
+    """Data files of a partition, oldest first"""
+    if not os.path.isdir(path):
+        return []
+    files = [os.path.join(path, name) for name in os.listdir(path)
+             if name.endswith('.parquet') and not name.startswith(('.', '_'))]
+    return sorted(files, key=lambda f: (_file_sequence(f), f))
+
+
+def _write_atomic(pq, table, path):
+    # Dot-prefixed files are ignored by Parquet dataset readers until renamed
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    pq.write_table(table, tmp_path, compression=COMPRESSION)
+    os.replace(tmp_path, path)
+
+
+def export_articles(articles, directory=PARQUET_DIR, compact_threshold=COMPACT_THRESHOLD):
+    """Append articles as one new file per (scrape_date, category) partition
+
+    Returns the number of files written, or None if pyarrow is unavailable.
+    """
+    modules = load_pyarrow()
+    if modules is None or not articles:
+        return None if modules is None else 0
+    pa, pq = modules
+
+    groups = {}
+    for article in articles:
+        groups.setdefault(partition_key(article), []).append(article)
+
+    stamp = f"{time.time_ns():020d}-{os.getpid()}"
+    for (scrape_date, category), group in groups.items():
+        path = partition_path(directory, scrape_date, category)
+        os.makedirs(path, exist_ok=True)
+        _write_atomic(pq, _to_table(pa, group), os.path.join(path, f"part-{stamp}.parquet"))
+        if compact_threshold and len(_part_files(path)) >= compact_threshold:
+            compact_partition(path)
+    return len(groups)
+
+
+def compact_partition(path):
+    """Merge all files of one partition into a single file; returns how many were merged"""
+    modules = load_pyarrow()
+    files = _part_files(path)
+    if modules is None or len(files) < 2:
+        return 0
+    pa, pq = modules
+
+    # Oldest file first, so a later row is always from a later write
+    tables = [pq.read_table(f, schema=article_schema(pa)) for f in files]
+    merged = pa.concat_tables(tables)
+    # Same URL twice (e.g. after a repeated backfill or an edit) keeps the most recent row
+    seen = set()
+    keep = []
+    urls = merged.column('url').to_pylist()
+    for i in range(len(urls) - 1, -1, -1):
+        if urls[i] not in seen:
+            seen.add(urls[i])
+            keep.append(i)
+    merged = merged.take(sorted(keep))
+
+    target = os.path.join(path, f"part-{_file_sequence(files[-1]):020d}-compacted.parquet")
+    _write_atomic(pq, merged, target)
+    for f in files:
+        if f != target:
+            os.remove(f)
+    return len(files)
+
+
+def compact_all(directory=PARQUET_DIR, min_files=2):
+    merged = 0
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        if os.path.basename(root).startswith('category=') and len(_part_files(root)) >= min_files:
+            merged += compact_partition(root)
+    return merged
+
+
+def dataset_stats(directory=PARQUET_DIR):
+    modules = load_pyarrow()
+    partitions = files = size = rows = 0
+    for root, _, _ in os.walk(directory):
+        parts = _part_files(root)
+        if not parts:
+            continue
+        partitions += 1
+        files += len(parts)
+        for f in parts:
+            size += os.path.getsize(f)
+            if modules is not None:
+                rows += modules[1].ParquetFile(f).metadata.num_rows
+    return {'partitions': partitions, 'files': files, 'rows': rows, 'size_mb': round(size / 1024 / 1024, 2)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the partitioned Parquet export")
+    parser.add_argument("--dir", default=PARQUET_DIR, help="dataset directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill = sub.add_parser("backfill", help="export every article in the scraper CSV")
+    backfill.add_argument("--csv", default="output/dhaka_post_today.csv")
+    compact = sub.add_parser("compact", help="merge small files in each partition")
+    compact.add_argument("--min-files", type=int, default=2)
+    sub.add_parser("stats", help="partition, file and row counts")
+    args = parser.parse_args(argv)
+
+    if load_pyarrow() is None and args.command != "stats":
+        print("pyarrow is required: pip install pyarrow", file=sys.stderr)
+        return 1
+
+    if args.command == "backfill":
+        from store import ArticleStore
+
+        store = ArticleStore(args.csv)
+        store.refresh()
+        written = export_articles(store.all(), args.dir, compact_threshold=0)
+        merged = compact_all(args.dir)
+        print(f"Exported {len(store)} articles into {written} partitions ({merged} files compacted)")
+    elif args.command == "compact":
+        print(f"Compacted {compact_all(args.dir, args.min_files)} files")
+    else:
+        print(json.dumps(dataset_stats(args.dir), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+# ======================= threaded fetch -> process-pool parse pipeline ===============
+#
+# Fetching is I/O-bound and parsing is CPU-bound, so they run on different
+# pools: a few threads download raw article bytes and hand them to worker
+# processes that build the soup and return plain article dicts. A semaphore
+# caps how many pages are between "fetch started" and "result consumed", so a
+# slow parse pool or caller makes the fetchers wait instead of piling HTML up
+# in memory.
+#
+# Parse workers are started from a forkserver (spawn where there is none), not
+# forked from the scraper: the scraper runs crawl, fetch and log listener
+# threads, and a fork taken while one of them holds a lock (a metrics counter,
+# a logging handler) leaves that lock held forever in the child. Whatever a
+# worker logs or counts while parsing is sent back with its result and
+# replayed in the scraper, so it reaches the log listener and /metrics.
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+
+PIPELINE_MODE = os.environ.get("SCRAPER_PIPELINE", "0") == "1"
+FETCH_WORKERS = int(os.environ.get("SCRAPER_FETCH_WORKERS", "8"))
+PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", str(os.cpu_count() or 1)))
+MAX_IN_FLIGHT = int(os.environ.get("SCRAPER_MAX_IN_FLIGHT", "0"))  # 0 = fetch + 2 x parse workers
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _RecordCollector(logging.Handler):
+    """Keeps a worker's log records until they are returned with the parse result"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        # Make the record picklable: format the message and traceback now
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        self.records.append(record)
+
+
+_collector = None
+
+
+def init_parse_worker(level=logging.INFO):
+    """Collect everything a parse worker logs, at the scraper's level, for the scraper to replay"""
+    global _collector
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    _collector = _RecordCollector()
+    root.addHandler(_collector)
+    root.setLevel(level)
+
+
+def _parse_in_worker(parse, content, encoding, url):
+    """Runs in a worker process: decode, parse and time one page
+
+    Returns (article, seconds, log records, counter deltas).
+    """
+    counters_before = metrics.REGISTRY.counter_totals()
+    start = time.perf_counter()
+    try:
+        html = content.decode(encoding, errors='replace') if encoding else content
+        article = parse(html, url)
+    except Exception as e:
+        # Counted and logged by the scraper, which sees the exception
+        article, error = None, e
+    else:
+        error = None
+    seconds = time.perf_counter() - start
+    records = []
+    if _collector is not None:
+        records, _collector.records = _collector.records, []
+    if error is not None:
+        raise ParseWorkerError(error, records, metrics.REGISTRY.counter_deltas(counters_before))
+    return article, seconds, records, metrics.REGISTRY.counter_deltas(counters_before)
+
+
+class ParseWorkerError(Exception):
+    """A parse that raised, carrying what the worker logged and counted before it did"""
+
+    def __init__(self, error, records=(), deltas=()):
+        super().__init__(error, records, deltas)
+        self.error = error
+        self.records = records
+        self.deltas = deltas
+
+    def __str__(self):
+        return str(self.error)
+
+
+def _replay(records, deltas):
+    for record in records:
+        logging.getLogger(record.name).handle(record)
+    metrics.REGISTRY.apply_counter_deltas(deltas)
+
+
+def process_context():
+    # Never fork the threaded scraper; see the header comment
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def run_pipeline(urls, fetch, parse, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+                 max_in_flight=MAX_IN_FLIGHT, preload=()):
+    """Yield (url, article) pairs as pages are fetched and parsed
+
+    fetch(url) runs in a thread and returns (content_bytes, encoding) or None.
+    parse(html, url) must be a picklable module-level function; it runs in a
+    worker process and returns an article dict or None. preload names modules
+    the forkserver imports once, so each worker does not. Results arrive in
+    completion order, with article None for pages that failed. Closing the
+    generator early (e.g. after enough articles) stops further fetches.
+    """
+    max_in_flight = max_in_flight or fetch_workers + 2 * parse_workers
+    slots = threading.Semaphore(max_in_flight)
+    results = queue.SimpleQueue()
+    stop = threading.Event()
+
+    context = process_context()
+    if preload and context.get_start_method() == 'forkserver':
+        context.set_forkserver_preload(list(preload))
+    fetchers = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch")
+    parsers = ProcessPoolExecutor(max_workers=parse_workers, mp_context=context,
+                                  initializer=init_parse_worker, initargs=(logging.getLogger().getEffectiveLevel(),))
+
+    def on_parsed(url, future):
+        if future.cancelled():
+            results.put((url, None))
+            return
+        try:
+            article, seconds, records, deltas = future.result()
+            _replay(records, deltas)
+            metrics.observe('article_parse', seconds)
+        except ParseWorkerError as e:
+            _replay(e.records, e.deltas)
+            metrics.record_error('article_parse', e.error)
+            logger.error(f"Error parsing article {url}: {e}")
+            article = None
+        except Exception as e:
+            metrics.record_error('article_parse', e)
+            logger.error(f"Error parsing article {url}: {e}")
+            article = None
+        results.put((url, article))
+
+    def on_fetched(url, future):
+        try:
+            fetched = None if future.cancelled() else future.result()
+        except Exception as e:
+            logger.error(f"Error fetching article {url}: {e}")
+            fetched = None
+        if fetched is None or stop.is_set():
+            results.put((url, None))
+            return
+        content, encoding = fetched
+        try:
+            parsed = parsers.submit(_parse_in_worker, parse, content, encoding, url)
+        except RuntimeError:  # pool already shut down
+            results.put((url, None))
+            return
+        parsed.add_done_callback(lambda f: on_parsed(url, f))
+
+    def feed():
+        submitted = 0
+        try:
+            for url in urls:
+                slots.acquire()  # backpressure: wait for the caller to take a result
+                if stop.is_set():
+                    slots.release()
+                    break
+                fetchers.submit(fetch, url).add_done_callback(lambda f, url=url: on_fetched(url, f))
+                submitted += 1
+        finally:
+            results.put((_DONE, submitted))
+
+    feeder = threading.Thread(target=feed, name="pipeline-feed", daemon=True)
+    feeder.start()
+
+    received = 0
+    expected = None
+    try:
+        while expected is None or received < expected:
+            url, article = results.get()
+            if url is _DONE:
+                expected = article
+                continue
+            received += 1
+            slots.release()
+            yield url, article
+    finally:
+        stop.set()
+        slots.release()  # wake the feeder if it is waiting for a slot
+        feeder.join()
+        fetchers.shutdown(wait=True, cancel_futures=True)
+        parsers.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,156 @@
+# ======================= opt-in per-request profiling ===============
+#
+# A profile is only active for requests that ask for one, so span() and
+# checkpoint() cost a single context-variable lookup everywhere else.
+# cProfile runs for one request at a time (the interpreter allows a single
+# active profiler) and only the newest PROFILE_KEEP .pstats files are kept.
+import cProfile
+import glob
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+PROFILE_DIR = "output/profiles"
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+
+_active = ContextVar('active_profile', default=None)
+_cprofile_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ('name', 'start', 'duration', 'depth', 'detail')
+
+    def __init__(self, name, start, duration, depth, detail=None):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.depth = depth
+        self.detail = detail
+
+
+class Profile:
+    """Timeline of spans recorded while handling one request"""
+
+    def __init__(self, with_cprofile=False):
+        self.origin = time.perf_counter()
+        self.last = self.origin
+        self.depth = 0
+        self.spans = []
+        # Another request holding the profiler just means no pstats for this one
+        self.cprofile = cProfile.Profile() if with_cprofile and _cprofile_lock.acquire(blocking=False) else None
+
+    def add(self, name, start, end, detail=None):
+        self.spans.append(Span(name, start - self.origin, end - start, self.depth, detail))
+
+    def server_timing(self):
+        """Aggregate spans by name into a Server-Timing header value"""
+        totals = {}
+        for span in self.spans:
+            total, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (total + span.duration, count + 1)
+        elapsed = time.perf_counter() - self.origin
+        parts = []
+        for name, (total, count) in totals.items():
+            token = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+            desc = f';desc="{count} calls"' if count > 1 else ''
+            parts.append(f"{token};dur={total * 1000:.2f}{desc}")
+        parts.append(f"total;dur={elapsed * 1000:.2f}")
+        return ", ".join(parts)
+
+    def timeline(self):
+        """Return spans as JSON-serializable dicts, in start order"""
+        return {
+            'total_ms': round((time.perf_counter() - self.origin) * 1000, 3),
+            'spans': [
+                {
+                    'name': span.name,
+                    'start_ms': round(span.start * 1000, 3),
+                    'duration_ms': round(span.duration * 1000, 3),
+                    'depth': span.depth,
+                    **({'detail': span.detail} if span.detail else {}),
+                }
+                for span in sorted(self.spans, key=lambda s: s.start)
+            ],
+        }
+
+    def dump_stats(self, directory=PROFILE_DIR, label="request"):
+        """Write the cProfile data as a .pstats file and return its path"""
+        if self.cprofile is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 1000000000:09d}-{safe_label}-{os.getpid()}.pstats")
+        self.cprofile.dump_stats(path)
+        prune_stats(directory)
+        return path
+
+
+def prune_stats(directory=PROFILE_DIR, keep=PROFILE_KEEP):
+    """Delete all but the newest keep .pstats files"""
+    paths = glob.glob(os.path.join(directory, "*.pstats"))
+    paths.sort(key=lambda path: os.stat(path).st_mtime if os.path.exists(path) else 0)
+    for path in paths[:-keep] if keep > 0 else paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def start(with_cprofile=False):
+    """Activate a profile for the current context and return it with its reset token"""
+    profile = Profile(with_cprofile)
+    token = _active.set(profile)
+    if profile.cprofile is not None:
+        profile.cprofile.enable()
+    return profile, token
+
+
+def stop(profile, token):
+    if profile.cprofile is not None:
+        profile.cprofile.disable()
+        _cprofile_lock.release()
+    _active.reset(token)
+
+
+def active():
+    return _active.get() is not None
+
+
+@contextmanager
+def span(name, detail=None):
+    """Record how long the enclosed block takes, if a profile is active"""
+    profile = _active.get()
+    if profile is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    profile.last = start_time
+    profile.depth += 1
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        end = time.perf_counter()
+        profile.add(name, start_time, end, detail)
+        profile.last = end
+
+
+def checkpoint(name):
+    """Record the time since the previous span boundary or checkpoint as a span"""
+    profile = _active.get()
+    if profile is None:
+        return
+    now = time.perf_counter()
+    profile.add(name, profile.last, now)
+    profile.last = now
+
+
+def record(name, seconds, detail=None):
+    """Record an externally measured duration ending now"""
+    profile = _active.get()
+    if profile is None:
+        return
+    end = time.perf_counter()
+    profile.add(name, end - seconds, end, detail)
@@ -0,0 +1,407 @@
+# ======================= retention, rotation and image garbage collection ===============
+#
+#   python retention.py run      # rotate, expire, clean backups and collect images once
+#   python retention.py stats
+#
+# The live CSV keeps only the last RETENTION_LIVE_DAYS days of articles (by
+# scraped_at, Bangladesh time). Older rows are moved into one gzip-compressed
+# CSV per scrape day under output/history/, so appends, tailing, snapshots and
+# the duplicate checks only ever touch a couple of days of data. history/index.json
+# records each day's file size, URLs and local image names, which lets the
+# other steps run without opening the history files:
+#
+# * days older than RETENTION_DAYS are deleted, then the oldest days until
+#   the history fits in RETENTION_MAX_MB (0 = no size cap);
+# * backup copies the scraper leaves in output/ are deleted after
+#   BACKUP_RETENTION_DAYS, always keeping the newest BACKUP_KEEP of each kind;
+# * images that no live or retained article references are deleted once they
+#   are IMAGE_GC_GRACE seconds old (younger ones may belong to a run in progress);
+# * raw archive segments fetched entirely before ARCHIVE_RETENTION_DAYS are
+#   deleted and dropped from the archive index, article versions replaced before
+#   RETENTION_DAYS are trimmed, and SimHash fingerprints are kept only for URLs
+#   still live or in the history.
+#
+# The scraper runs this from a background thread every RETENTION_INTERVAL seconds.
+import argparse
+import csv
+import glob
+import gzip
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from store import OUTPUT_CSV, CSV_COLUMNS, article_to_row, row_to_article, write_lock
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR = "output/history"
+HISTORY_INDEX = "index.json"
+IMAGE_DIR = "images"
+RETENTION_ENABLED = os.environ.get("SCRAPER_RETENTION", "1") == "1"
+RETENTION_INTERVAL = float(os.environ.get("RETENTION_INTERVAL", "3600"))   # seconds between runs
+RETENTION_LIVE_DAYS = int(os.environ.get("RETENTION_LIVE_DAYS", "2"))      # today and yesterday
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "90"))
+RETENTION_MAX_MB = float(os.environ.get("RETENTION_MAX_MB", "0"))
+BACKUP_RETENTION_DAYS = int(os.environ.get("BACKUP_RETENTION_DAYS", "7"))
+BACKUP_KEEP = 3
+BACKUP_PATTERNS = ("dhaka_post_backup_*", "dhaka_post_today_backup_*",
+                   "dhaka_post_emergency_*", "dhaka_post_corrupted_*")
+IMAGE_GC_GRACE = float(os.environ.get("IMAGE_GC_GRACE", str(6 * 60 * 60)))  # seconds
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", str(RETENTION_DAYS)))
+KNOWN_URL_DAYS = 7  # rotated days whose URLs still count as already scraped
+
+
+def bangladesh_today():
+    import pytz
+
+    return datetime.now(pytz.timezone('Asia/Dhaka')).date()
+
+
+def scrape_day(row):
+    """YYYY-MM-DD of a row's scraped_at, or None if it has none"""
+    scraped_at = row.get('scraped_at') or row.get('timestamp') or ''
+    return scraped_at[:10] if len(scraped_at) >= 10 and scraped_at[4] == '-' else None
+
+
+class History:
+    """Per-day gzip CSV files of rotated articles, with a small JSON index"""
+
+    def __init__(self, directory=HISTORY_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, HISTORY_INDEX)
+        self.days = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                return json.load(f)['days']
+        except FileNotFoundError:
+            return self._rebuild_index()
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Could not read history index, rebuilding from the day files: {e}")
+            return self._rebuild_index()
+
+    def _rebuild_index(self):
+        days = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "articles-*.csv.gz"))):
+            day = os.path.basename(path)[len("articles-"):-len(".csv.gz")]
+            entry = days[day] = {'file': os.path.basename(path), 'rows': 0, 'bytes': 0, 'urls': [], 'images': []}
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+                for row in csv.DictReader(f):
+                    self._add_to_entry(entry, row_to_article(row))
+            entry['bytes'] = os.path.getsize(path)
+        return days
+
+    def save_index(self):
+        tmp_path = f"{self.index_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'days': self.days}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _add_to_entry(entry, article):
+        entry['rows'] += 1
+        entry['urls'].append(article['url'])
+        entry['images'].extend(os.path.basename(path) for path in article['local_images'])
+
+    def append(self, day, articles):
+        """Add articles to a day's file; a second rotation of the same day adds a gzip member"""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self.days.setdefault(day, {'file': f"articles-{day}.csv.gz", 'rows': 0, 'bytes': 0,
+                                           'urls': [], 'images': []})
+        path = os.path.join(self.directory, entry['file'])
+        new_file = not os.path.exists(path)
+        with gzip.open(path, 'at', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, quoting=csv.QUOTE_ALL, lineterminator='\n')
+            if new_file:
+                writer.writeheader()
+            for article in articles:
+                writer.writerow(article_to_row(article))
+                self._add_to_entry(entry, article)
+        entry['bytes'] = os.path.getsize(path)
+
+    def remove(self, day):
+        entry = self.days.pop(day)
+        try:
+            os.remove(os.path.join(self.directory, entry['file']))
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def size_bytes(self):
+        return sum(entry['bytes'] for entry in self.days.values())
+
+    def urls(self, since_day=None):
+        return {url for day, entry in self.days.items() if since_day is None or day >= since_day
+                for url in entry['urls']}
+
+    def images(self):
+        return {name for entry in self.days.values() for name in entry['images']}
+
+    def read(self, day):
+        """Yield the articles of one rotated day"""
+        entry = self.days[day]
+        with gzip.open(os.path.join(self.directory, entry['file']), 'rt', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row_to_article(row)
+
+
+def rotate(csv_path=OUTPUT_CSV, history=None, live_days=RETENTION_LIVE_DAYS, today=None):
+    """Move rows scraped before the live window into the history; returns how many moved
+
+    A history passed in must have been loaded under write_lock(csv_path),
+    which the caller still holds; otherwise its index may be stale.
+    """
+    cutoff = ((today or bangladesh_today()) - timedelta(days=live_days - 1)).isoformat()
+    if not os.path.exists(csv_path):
+        return 0
+
+    with write_lock(csv_path):
+        history = history or History()
+        old = {}
+        tmp_path = f"{csv_path}.tmp.{os.getpid()}"
+        with open(csv_path, newline='', encoding='utf-8') as src:
+            reader = csv.DictReader(src)
+            rows = list(reader)
+            fieldnames = reader.fieldnames or CSV_COLUMNS
+        kept = []
+        for row in rows:
+            day = scrape_day(row)
+            if day is not None and day < cutoff:
+                old.setdefault(day, []).append(row_to_article(row))
+            else:
+                kept.append(row)
+        if not old:
+            return 0
+
+        # History first: a crash before the swap leaves rows in both places, never in neither
+        for day, articles in sorted(old.items()):
+            history.append(day, articles)
+        history.save_index()
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, quoting=csv.QUOTE_ALL, lineterminator='\n',
+                                    restval='', extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(kept)
+        os.replace(tmp_path, csv_path)
+
+    moved = sum(len(articles) for articles in old.values())
+    logger.info(f"Rotated {moved} articles from {len(old)} days into {history.directory}; {len(kept)} remain live")
+    return moved
+
+
+def expire(history, max_days=RETENTION_DAYS, max_mb=RETENTION_MAX_MB, today=None):
+    """Drop history days past the age limit, then the oldest until under the size cap
+
+    Call with write_lock() held since history was loaded; see run_retention().
+    """
+    cutoff = ((today or bangladesh_today()) - timedelta(days=max_days)).isoformat()
+    removed = [history.remove(day) for day in sorted(history.days) if day < cutoff]
+    if max_mb:
+        limit = max_mb * 1024 * 1024
+        for day in sorted(history.days):
+            if history.size_bytes() <= limit:
+                break
+            removed.append(history.remove(day))
+    if removed:
+        history.save_index()
+        logger.info(f"Expired {len(removed)} history days ({sum(e['rows'] for e in removed)} articles)")
+    return len(removed)
+
+
+def clean_backups(directory="output", max_age_days=BACKUP_RETENTION_DAYS, keep=BACKUP_KEEP, now=None):
+    """Delete old backup/emergency/corrupted CSV copies, keeping the newest few of each kind"""
+    cutoff = (now or time.time()) - max_age_days * 24 * 60 * 60
+    removed = 0
+    for pattern in BACKUP_PATTERNS:
+        paths = sorted(glob.glob(os.path.join(directory, pattern)), key=os.path.getmtime, reverse=True)
+        for path in paths[keep:]:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    if removed:
+        logger.info(f"Removed {removed} old backup files from {directory}")
+    return removed
+
+
+def expire_archive(max_days=ARCHIVE_RETENTION_DAYS, today=None):
+    """Delete raw archive segments older than max_days; returns (segments, bytes) freed"""
+    import archive
+    import pytz
+
+    if not os.path.isdir(archive.ARCHIVE_DIR):
+        return 0, 0
+    cutoff = pytz.timezone('Asia/Dhaka').localize(
+        datetime.combine((today or bangladesh_today()) - timedelta(days=max_days), datetime.min.time()))
+    segments, freed = archive.RawArchive(archive.ARCHIVE_DIR).expire(cutoff.timestamp())
+    if segments:
+        logger.info(f"Removed {segments} raw archive segments ({freed / 1024 / 1024:.1f} MB)")
+    return segments, freed
+
+
+def trim_versions(max_days=RETENTION_DAYS, today=None):
+    """Drop article versions replaced more than max_days ago; call with write_lock() held"""
+    import revisit
+
+    cutoff = ((today or bangladesh_today()) - timedelta(days=max_days)).isoformat()
+    removed = revisit.trim_versions(cutoff)
+    if removed:
+        logger.info(f"Removed {removed} old article versions")
+    return removed
+
+
+def prune_fingerprints(history, csv_path=OUTPUT_CSV):
+    """Forget near-duplicate fingerprints of articles no longer live or retained
+
+    Call with write_lock() held; the scraper saves the index under it too.
+    """
+    import neardup
+
+    if not os.path.exists(neardup.NEAR_DUP_INDEX):
+        return 0
+    index = neardup.SimHashIndex.load(neardup.NEAR_DUP_INDEX)
+    removed = index.retain(live_urls(csv_path) | history.urls())
+    if removed:
+        index.save(neardup.NEAR_DUP_INDEX)
+        logger.info(f"Removed {removed} expired near-duplicate fingerprints")
+    return removed
+
+
+def live_urls(csv_path=OUTPUT_CSV):
+    if not os.path.exists(csv_path):
+        return set()
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        return {row['url'] for row in csv.DictReader(f) if row.get('url')}
+
+
+def live_images(csv_path=OUTPUT_CSV):
+    names = set()
+    if os.path.exists(csv_path):
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                names.update(os.path.basename(path) for path in row_to_article(row)['local_images'])
+    return names
+
+
+def collect_images(history, csv_path=OUTPUT_CSV, image_dir=IMAGE_DIR, grace=IMAGE_GC_GRACE, now=None):
+    """Delete images no live or retained article points to; returns (files, bytes) freed"""
+    if not os.path.isdir(image_dir):
+        return 0, 0
+    referenced = live_images(csv_path) | history.images()
+    cutoff = (now or time.time()) - grace
+    files = freed = 0
+    with os.scandir(image_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name in referenced:
+                continue
+            st = entry.stat()
+            if st.st_mtime >= cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            files += 1
+            freed += st.st_size
+    if files:
+        logger.info(f"Removed {files} unreferenced images ({freed / 1024 / 1024:.1f} MB)")
+    return files, freed
+
+
+def run_retention(csv_path=OUTPUT_CSV, history_dir=HISTORY_DIR, image_dir=IMAGE_DIR, on_rotated=None):
+    """One full pass: rotate, expire, clean backups, collect images and trim the
+    archive, versions and fingerprints; returns a summary dict"""
+    # The history index is loaded, changed and saved under the store lock, so a
+    # second pass (the CLI next to the scraper's thread) never saves a stale
+    # index over this one's and loses its day entries. Versions and fingerprints
+    # are appended under the same lock.
+    with write_lock(csv_path):
+        history = History(history_dir)
+        summary = {'rotated': rotate(csv_path, history)}
+        summary['expired_days'] = expire(history)
+        summary['versions_removed'] = trim_versions()
+        summary['fingerprints_removed'] = prune_fingerprints(history, csv_path)
+    if summary['rotated'] and on_rotated:
+        on_rotated()
+    summary['backups_removed'] = clean_backups(os.path.dirname(csv_path) or ".")
+    summary['images_removed'], summary['image_bytes_freed'] = collect_images(history, csv_path, image_dir)
+    summary['archive_segments_removed'], summary['archive_bytes_freed'] = expire_archive()
+    return summary
+
+
+def known_urls(history_dir=HISTORY_DIR, days=KNOWN_URL_DAYS):
+    """URLs rotated out in the last few days, so the scraper does not fetch them again"""
+    if not os.path.exists(os.path.join(history_dir, HISTORY_INDEX)):
+        return set()
+    since = (bangladesh_today() - timedelta(days=days)).isoformat()
+    return History(history_dir).urls(since)
+
+
+class RetentionJob(threading.Thread):
+    """Background thread that runs the retention pass on an interval"""
+
+    def __init__(self, interval=RETENTION_INTERVAL, on_rotated=None):
+        super().__init__(name="retention", daemon=True)
+        self.interval = interval
+        self.on_rotated = on_rotated
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                run_retention(on_rotated=self.on_rotated)
+            except Exception as e:
+                logger.error(f"Error in retention job: {e}", exc_info=True)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def retention_stats(csv_path=OUTPUT_CSV, history_dir=HISTORY_DIR, image_dir=IMAGE_DIR):
+    history = History(history_dir)
+    images = [entry.stat().st_size for entry in os.scandir(image_dir) if entry.is_file()] \
+        if os.path.isdir(image_dir) else []
+    return {
+        'live_mb': round(os.path.getsize(csv_path) / 1024 / 1024, 2) if os.path.exists(csv_path) else 0,
+        'history_days': len(history.days),
+        'history_articles': sum(entry['rows'] for entry in history.days.values()),
+        'history_mb': round(history.size_bytes() / 1024 / 1024, 2),
+        'oldest_day': min(history.days) if history.days else None,
+        'images': len(images),
+        'images_mb': round(sum(images) / 1024 / 1024, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rotate and expire stored articles and images")
+    parser.add_argument("--csv", default=OUTPUT_CSV)
+    parser.add_argument("--history", default=HISTORY_DIR, help="directory of rotated day files")
+    parser.add_argument("--images", default=IMAGE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="rotate, expire, clean backups and collect unreferenced images")
+    sub.add_parser("stats", help="sizes of the live store, history and image directory")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        from snapshot import SNAPSHOT_PATH, write_snapshot
+        from store import ArticleStore
+
+        def publish():
+            store = ArticleStore(args.csv)
+            store.refresh()
+            write_snapshot(store.all(), SNAPSHOT_PATH)
+
+        logging.basicConfig(level=logging.INFO, format="%(message)s")
+        print(json.dumps(run_retention(args.csv, args.history, args.images, on_rotated=publish), indent=2))
+    else:
+        print(json.dumps(retention_stats(args.csv, args.history, args.images), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# ======================= revisit scheduler for already-scraped articles ===============
+#
+# Stories get edited after publication. Each tracked article is re-checked on
+# a decaying schedule (REVISIT_BASE_INTERVAL, doubling after every unchanged
+# check up to REVISIT_MAX_INTERVAL) for REVISIT_WINDOW after it was first
+# scraped. A revisit is a conditional GET; a 304 or an identical raw body ends
+# the check without parsing. Otherwise the page is re-extracted and the stored
+# record is only rewritten when the hash of the extracted title and body
+# changes. The replaced version is appended to VERSIONS_FILE first, so the CSV
+# always holds the current text and the versions file the history.
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+import archive
+import metrics
+import upstream
+from store import CSV_COLUMNS, MISSING_CONTENT, article_to_row, write_lock
+
+logger = logging.getLogger(__name__)
+
+REVISIT_ENABLED = os.environ.get("SCRAPER_REVISIT", "1") == "1"
+REVISIT_STATE_FILE = "output/revisit_state.json"
+VERSIONS_FILE = "output/article_versions.jsonl"
+REVISIT_BASE_INTERVAL = float(os.environ.get("REVISIT_BASE_INTERVAL", str(15 * 60)))    # seconds
+REVISIT_MAX_INTERVAL = float(os.environ.get("REVISIT_MAX_INTERVAL", str(24 * 60 * 60)))
+REVISIT_WINDOW = float(os.environ.get("REVISIT_WINDOW", str(3 * 24 * 60 * 60)))          # stop after this
+REVISIT_BATCH = int(os.environ.get("REVISIT_BATCH", "50"))                               # checks per run
+BD_TZ = pytz.timezone('Asia/Dhaka')
+
+
+def content_hash(article):
+    """Hash of the extracted fields an edit would change"""
+    text = "\x1f".join((article.get('title') or '', article.get('content') or ''))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def scraped_at_epoch(value, default):
+    try:
+        return BD_TZ.localize(datetime.strptime(value, '%Y-%m-%d %H:%M:%S')).timestamp()
+    except (TypeError, ValueError):
+        return default
+
+
+class RevisitState:
+    """Per-URL revisit bookkeeping persisted as one JSON file"""
+
+    def __init__(self, path=REVISIT_STATE_FILE):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read revisit state, starting fresh: {e}")
+            self.entries = {}
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, ensure_ascii=False)
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+    def track(self, article, now=None):
+        """Start revisiting an article unless it is already tracked or too old"""
+        now = time.time() if now is None else now
+        url = article['url']
+        with self._lock:
+            if url in self.entries:
+                return False
+            first_seen = scraped_at_epoch(article.get('scraped_at'), now)
+            if now - first_seen > REVISIT_WINDOW:
+                return False
+            self.entries[url] = {
+                'first_seen': first_seen,
+                'next_check': now + REVISIT_BASE_INTERVAL,
+                'interval': REVISIT_BASE_INTERVAL,
+                'content_hash': content_hash(article),
+                'body_hash': None,
+                'etag': None,
+                'last_modified': None,
+                'checks': 0,
+                'version': 1,
+            }
+            return True
+
+    def due(self, now=None, limit=REVISIT_BATCH):
+        """URLs whose next check has passed, most overdue first; expired entries are dropped"""
+        now = time.time() if now is None else now
+        with self._lock:
+            for url in [u for u, e in self.entries.items() if now - e['first_seen'] > REVISIT_WINDOW]:
+                del self.entries[url]
+            due = sorted((e['next_check'], url) for url, e in self.entries.items() if e['next_check'] <= now)
+        return [url for _, url in due[:limit]]
+
+    def reschedule(self, url, changed, now=None):
+        """Back off after an unchanged check, start over after a change"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self.entries[url]
+            entry['checks'] += 1
+            if changed:
+                entry['interval'] = REVISIT_BASE_INTERVAL
+            else:
+                entry['interval'] = min(entry['interval'] * 2, REVISIT_MAX_INTERVAL)
+            entry['next_check'] = now + entry['interval']
+
+
+def check_article(url, entry, parse, headers):
+    """Conditionally re-fetch one article
+
+    Returns (status, article), where status is 'not_modified', 'same_body',
+    'unchanged', 'changed' or 'error', and article is the re-extracted dict
+    for 'changed'. An extraction without real content is an 'error'. Updates
+    the validators and hashes in entry after a successful parse.
+    """
+    request_headers = dict(headers)
+    if entry.get('etag'):
+        request_headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        request_headers['If-Modified-Since'] = entry['last_modified']
+
+    try:
+        with metrics.stage('revisit_fetch') as timer:
+            response, content, encoding = upstream.get_body(url, headers=request_headers, timeout=30)
+            if response.status_code == 304:
+                return 'not_modified', None
+            response.raise_for_status()
+            timer.bytes = len(content)
+    except Exception as e:
+        logger.warning(f"Revisit of {url} failed: {e}")
+        return 'error', None
+
+    body_hash = hashlib.sha256(content).hexdigest()
+    if body_hash == entry.get('body_hash'):
+        return 'same_body', None
+
+    raw_archive = archive.default_archive()
+    if raw_archive is not None:
+        try:
+            raw_archive.append(url, content, encoding, response.status_code,
+                               response.headers.get('Content-Type'))
+        except OSError as e:
+            logger.warning(f"Could not archive {url}: {e}")
+
+    html = content.decode(encoding, errors='replace')
+    with metrics.stage('article_parse'):
+        article = parse(html, url)
+    if not article or article.get('content', '').strip() in ('', MISSING_CONTENT):
+        # A selector miss or soft-error page; keep the stored text and try this body again next time
+        return 'error', None
+
+    # Validators and body hash only once the body parsed, or a failed page would never be re-parsed
+    entry['etag'] = response.headers.get('ETag') or entry.get('etag')
+    entry['last_modified'] = response.headers.get('Last-Modified') or entry.get('last_modified')
+    entry['body_hash'] = body_hash
+    new_hash = content_hash(article)
+    if new_hash == entry['content_hash']:
+        return 'unchanged', None
+    entry['content_hash'] = new_hash
+    return 'changed', article
+
+
+# Values the extractor fills in when it finds nothing; they never replace stored ones
+PLACEHOLDERS = {'date': "No date found", 'content': MISSING_CONTENT, 'author': "Unknown"}
+
+
+def merge_update(stored, fresh):
+    """The fresh extraction, keeping what a revisit does not refetch or failed to find"""
+    merged = dict(stored)
+    for field in ('title', 'date', 'content', 'images', 'category', 'author'):
+        if fresh.get(field) and fresh[field] != PLACEHOLDERS.get(field):
+            merged[field] = fresh[field]
+    return merged
+
+
+def rewrite_csv(path, updates):
+    """Replace the rows for the given URLs (url -> article) and atomically swap the file in"""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with write_lock(path):
+        with open(path, newline='', encoding='utf-8') as src, \
+                open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+            reader = csv.DictReader(src)
+            fieldnames = reader.fieldnames or CSV_COLUMNS
+            writer = csv.DictWriter(dst, fieldnames=fieldnames, quoting=csv.QUOTE_ALL, lineterminator='\n',
+                                    restval='', extrasaction='ignore')
+            writer.writeheader()
+            for row in reader:
+                article = updates.get(row.get('url'))
+                writer.writerow(article_to_row(article) if article else row)
+        os.replace(tmp_path, path)
+
+
+def append_versions(path, versions):
+    with open(path, 'a', encoding='utf-8') as f:
+        for version in versions:
+            f.write(json.dumps(version, ensure_ascii=False) + "\n")
+
+
+def trim_versions(before, path=VERSIONS_FILE):
+    """Drop versions replaced before the day `before` (YYYY-MM-DD); returns how many
+
+    Call with the store's write lock held: run_revisits() appends under it,
+    and an append to the file being replaced would be lost.
+    """
+    if not os.path.exists(path):
+        return 0
+    removed = 0
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            try:
+                keep = json.loads(line).get('replaced_at', '') >= before
+            except ValueError:
+                keep = False  # a torn line
+            if keep:
+                dst.write(line)
+            else:
+                removed += 1
+    if removed:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return removed
+
+
+def run_revisits(state, stored_articles, parse, headers, csv_path, delay=0.0,
+                 versions_path=VERSIONS_FILE, limit=REVISIT_BATCH):
+    """Check the due articles and rewrite changed records; returns a status count dict
+
+    stored_articles maps url -> current stored article (unified schema).
+    """
+    now = time.time()
+    for article in stored_articles.values():
+        state.track(article, now)
+
+    counts = {}
+    updates = {}
+    versions = []
+    for url in state.due(now, limit):
+        stored = stored_articles.get(url)
+        if stored is None:
+            with state._lock:
+                state.entries.pop(url, None)
+            continue
+        entry = state.entries[url]
+        status, fresh = check_article(url, entry, parse, headers)
+        counts[status] = counts.get(status, 0) + 1
+        if status == 'changed':
+            versions.append({
+                'url': url,
+                'version': entry['version'],
+                'replaced_at': datetime.now(BD_TZ).strftime('%Y-%m-%d %H:%M:%S'),
+                **{field: stored[field] for field in ('title', 'date', 'content', 'images', 'category', 'author')},
+            })
+            entry['version'] += 1
+            updates[url] = merge_update(stored, fresh)
+            logger.info(f"Article changed, now version {entry['version']}: {url}")
+        state.reschedule(url, status == 'changed')
+        if delay:
+            time.sleep(delay)
+
+    if updates:
+        # Retention trims the versions file under the same lock
+        with write_lock(csv_path):
+            append_versions(versions_path, versions)
+            rewrite_csv(csv_path, updates)
+    state.save()
+    return counts
+
@@ -0,0 +1,266 @@
+# ======================= incrementally maintained article statistics ===============
+#
+#   python rollups.py rebuild    # recount from the live CSV and the rotated history
+#   python rollups.py show --hours 24 --days 7
+#
+# The scraper adds every article it commits to a set of counters kept in
+# output/stats.json: per hour (articles by category), per day (categories,
+# authors and a histogram of scrape lag, the time between an article's
+# published date and when we stored it) and all-time totals. Hourly buckets
+# are kept for ROLLUP_HOURS and daily buckets for ROLLUP_DAYS, so the file has
+# a fixed size. The API's /stats merges at most that many buckets: its cost
+# does not depend on how many articles have been stored.
+import argparse
+import email.utils
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+STATS_PATH = "output/stats.json"
+ROLLUP_HOURS = int(os.environ.get("ROLLUP_HOURS", str(7 * 24)))
+ROLLUP_DAYS = int(os.environ.get("ROLLUP_DAYS", "90"))
+LAG_BUCKETS = (5, 15, 30, 60, 120, 360, 720, 1440, 2880, 10080)  # minutes
+SCRAPED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+TOP_AUTHORS = 10
+
+
+def _tz():
+    import pytz
+
+    return pytz.timezone('Asia/Dhaka')
+
+
+def parse_published(value):
+    """Published time of an article's date field as an aware datetime, or None"""
+    value = (value or '').strip()
+    # A bare date says nothing about the time of day, so no lag can be derived from it
+    if len(value) <= 10:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = _tz().localize(parsed)
+    return parsed
+
+
+def scrape_lag_minutes(article):
+    """Minutes between publication and scrape, or None if either is unknown"""
+    published = parse_published(article.get('date'))
+    if published is None:
+        return None
+    try:
+        scraped = _tz().localize(datetime.strptime(article.get('scraped_at') or '', SCRAPED_AT_FORMAT))
+    except ValueError:
+        return None
+    return max((scraped - published).total_seconds() / 60, 0.0)
+
+
+def lag_bucket(minutes):
+    for i, bound in enumerate(LAG_BUCKETS):
+        if minutes <= bound:
+            return i
+    return len(LAG_BUCKETS)
+
+
+def _count(counter, key, amount=1):
+    counter[key] = counter.get(key, 0) + amount
+
+
+def _empty_day():
+    return {'articles': 0, 'categories': {}, 'authors': {},
+            'lag': [0] * (len(LAG_BUCKETS) + 1), 'lag_sum': 0.0, 'lag_unknown': 0}
+
+
+class Rollups:
+    """Hourly, daily and all-time article counters persisted as one JSON file"""
+
+    def __init__(self, path=STATS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._empty()
+        self._ident = None
+
+    @staticmethod
+    def _empty():
+        return {'updated_at': None, 'totals': {'articles': 0, 'categories': {}, 'authors': {}},
+                'hourly': {}, 'daily': {}}
+
+    def load(self):
+        """Re-read the file if it changed since the last load; cheap enough to call per request"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self
+        ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if ident == self._ident:
+            return self
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read {self.path}: {e}")
+            return self
+        with self._lock:
+            self.data = data
+            self._ident = ident
+        return self
+
+    def save(self):
+        with self._lock:
+            body = json.dumps(self.data, ensure_ascii=False, separators=(',', ':'))
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+
+    def add(self, articles):
+        """Count newly committed articles (unified schema) into every bucket they fall in"""
+        with self._lock:
+            data = self.data
+            totals = data['totals']
+            for article in articles:
+                scraped_at = article.get('scraped_at') or ''
+                if len(scraped_at) < 13:
+                    continue
+                hour, day = scraped_at[:13], scraped_at[:10]
+                category = article.get('category') or 'General'
+                author = article.get('author') or 'Unknown'
+
+                totals['articles'] += 1
+                _count(totals['categories'], category)
+                _count(totals['authors'], author)
+
+                bucket = data['hourly'].setdefault(hour, {'articles': 0, 'categories': {}})
+                bucket['articles'] += 1
+                _count(bucket['categories'], category)
+
+                bucket = data['daily'].setdefault(day, _empty_day())
+                bucket['articles'] += 1
+                _count(bucket['categories'], category)
+                _count(bucket['authors'], author)
+                lag = scrape_lag_minutes(article)
+                if lag is None:
+                    bucket['lag_unknown'] += 1
+                else:
+                    bucket['lag'][lag_bucket(lag)] += 1
+                    bucket['lag_sum'] += lag
+            self._prune()
+            data['updated_at'] = datetime.now(_tz()).strftime(SCRAPED_AT_FORMAT)
+
+    def _prune(self):
+        for key, keep in (('hourly', ROLLUP_HOURS), ('daily', ROLLUP_DAYS)):
+            buckets = self.data[key]
+            for old in sorted(buckets)[:-keep]:
+                del buckets[old]
+
+    def view(self, hours=24, days=7, top=TOP_AUTHORS, now=None):
+        """Dashboard summary over the last `hours` hours and `days` days (the current ones included)
+
+        Windows are wall-clock: after a gap in scraping, hours with no
+        articles are simply missing rather than older buckets taking their place.
+        """
+        now = now or datetime.now(_tz())
+        first_hour = (now - timedelta(hours=hours - 1)).strftime('%Y-%m-%d %H') if hours > 0 else None
+        first_day = (now - timedelta(days=days - 1)).strftime('%Y-%m-%d') if days > 0 else None
+        with self._lock:
+            data = self.data
+            hourly = [dict(bucket, hour=hour) for hour, bucket in sorted(data['hourly'].items())
+                      if first_hour and hour >= first_hour]
+            daily_items = [(day, bucket) for day, bucket in sorted(data['daily'].items())
+                           if first_day and day >= first_day]
+            authors = {}
+            lag = [0] * (len(LAG_BUCKETS) + 1)
+            lag_sum = 0.0
+            lag_unknown = 0
+            for _, bucket in daily_items:
+                for author, count in bucket['authors'].items():
+                    _count(authors, author, count)
+                lag = [a + b for a, b in zip(lag, bucket['lag'])]
+                lag_sum += bucket['lag_sum']
+                lag_unknown += bucket['lag_unknown']
+            daily = [{'day': day, 'articles': bucket['articles'], 'categories': bucket['categories']}
+                     for day, bucket in daily_items]
+            totals = {'articles': data['totals']['articles'], 'categories': dict(data['totals']['categories'])}
+            updated_at = data['updated_at']
+
+        known = sum(lag)
+        labels = [f"<={bound}m" for bound in LAG_BUCKETS] + [f">{LAG_BUCKETS[-1]}m"]
+        return {
+            'updated_at': updated_at,
+            'totals': totals,
+            'hourly': hourly,
+            'daily': daily,
+            'top_authors': [{'author': author, 'articles': count}
+                            for author, count in sorted(authors.items(), key=lambda item: -item[1])[:top]],
+            'scrape_lag': {
+                'articles': known,
+                'unknown': lag_unknown,
+                'mean_minutes': round(lag_sum / known, 1) if known else None,
+                'p50_minutes': _bucket_quantile(lag, 0.5),
+                'p90_minutes': _bucket_quantile(lag, 0.9),
+                'buckets': dict(zip(labels, lag)),
+            },
+        }
+
+
+def _bucket_quantile(buckets, q):
+    """Upper bound in minutes of the bucket holding the q-quantile (None if empty or unbounded)"""
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip(LAG_BUCKETS + (None,), buckets):
+        seen += count
+        if seen >= q * total:
+            return bound
+    return None
+
+
+def rebuild(csv_path=None, history_dir=None, path=STATS_PATH):
+    """Recount everything from the live CSV and the rotated history; returns the article count"""
+    import retention
+    from store import ArticleStore, OUTPUT_CSV, write_lock
+
+    csv_path = csv_path or OUTPUT_CSV
+    rollups = Rollups(path)
+    # The scraper updates the file under this lock; a concurrent commit is either counted here or after
+    with write_lock(csv_path):
+        history = retention.History(history_dir or retention.HISTORY_DIR)
+        for day in sorted(history.days):
+            rollups.add(history.read(day))
+        store = ArticleStore(csv_path)
+        store.refresh()
+        rollups.add(store.all())
+        rollups.save()
+    return rollups.data['totals']['articles']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the article statistics behind /stats")
+    parser.add_argument("--path", default=STATS_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="recount from the live CSV and rotated history")
+    show = sub.add_parser("show", help="print the /stats summary")
+    show.add_argument("--hours", type=int, default=24)
+    show.add_argument("--days", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.command == "rebuild":
+        print(f"Counted {rebuild(path=args.path)} articles into {args.path}")
+    else:
+        print(json.dumps(Rollups(args.path).load().view(args.hours, args.days), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
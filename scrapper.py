@@ -1,47 +1,62 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import csv
+import functools
+import json
 import os
 import time
 from datetime import datetime, timedelta
 import pytz
 from urllib.parse import urljoin
 import re
-import pandas as pd
 import hashlib
 import logging
-import schedule
 import sys
+import threading
 import urllib.parse
-import traceback
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scraper.log"),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-logger = logging.getLogger(__name__)
 
-# Create output directories if they don't exist
-os.makedirs("images", exist_ok=True)
-os.makedirs("output", exist_ok=True)
+from store import ArticleStore, CSV_COLUMNS, MISSING_CONTENT, article_to_row, write_lock
+from snapshot import SNAPSHOT_PATH, write_snapshot
+import archive
+import crawl
+import discovery
+import metrics
+import parquet_export
+import pipeline
+import retention
+import revisit
+import rollups
+import sites
+import upstream
+from log_setup import setup_logging
+
+# pandas, NumPy (via neardup) and BeautifulSoup are imported where they are
+# used, and importing this module does no I/O: logging and the output
+# directories are set up by init(), so the CLI starts in a fraction of a second.
+logger = logging.getLogger(__name__)
 
 # Constants
 OUTPUT_CSV = "output/dhaka_post_today.csv"
-BASE_URL = "https://www.dhakapost.com/latest-news"
-CATEGORY_URLS = [
-    "https://www.dhakapost.com/latest-news",
-    "https://www.dhakapost.com/bangladesh",
-    "https://www.dhakapost.com/world",
-    "https://www.dhakapost.com/sports",
-    "https://www.dhakapost.com/entertainment"
-]
-PAGINATION_PATTERN = "?page={}"
-MIN_ARTICLES = 25
+# Listing URLs, selectors, category rules and politeness limits live in the
+# per-site adapters under sites/ (see sites.py)
+MIN_ARTICLES = int(os.environ.get("SCRAPER_MIN_ARTICLES", "25"))
+REQUEST_DELAY = float(os.environ.get("SCRAPER_REQUEST_DELAY", "2"))  # seconds between requests to the site
+HTML_PARSER = 'html.parser'  # BeautifulSoup tree builder; 'lxml' is faster when installed
+SCHEDULE_INTERVAL = 10  # minutes between runs in schedule mode
+
+# Incrementally maintained view of OUTPUT_CSV used to publish snapshots
+article_store = ArticleStore(OUTPUT_CSV)
+
+# Schedule for re-checking recent articles for edits, loaded on first use
+_revisit_state = None
+
+# SimHash fingerprints of stored articles, loaded on first use
+_near_duplicates = None
+
+# Counters behind the API's /stats, loaded on first use
+_rollups = None
+
+# The retention thread publishes snapshots too
+_snapshot_lock = threading.Lock()
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -49,6 +64,20 @@ HEADERS = {
     'Accept-Language': 'en-US,en;q=0.9,bn;q=0.8',
 }
 
+def init(console=True):
+    """Set up logging and the output directories; safe to call more than once"""
+    # JSON lines to a rotating scraper.log plus console, written by a background
+    # listener thread so the fetch/parse loops never block on I/O
+    os.makedirs("images", exist_ok=True)
+    os.makedirs("output", exist_ok=True)
+    setup_logging(log_file="scraper.log", console=console)
+
+def get_revisit_state():
+    global _revisit_state
+    if _revisit_state is None:
+        _revisit_state = revisit.RevisitState()
+    return _revisit_state
+
 def get_bangladesh_time():
     """Get current date/time in Bangladesh timezone"""
     bd_tz = pytz.timezone('Asia/Dhaka')
@@ -124,6 +153,8 @@ def get_existing_articles():
     existing_titles = set()
     
     if os.path.exists(OUTPUT_CSV):
+        import pandas as pd
+        
         try:
             existing_df = pd.read_csv(OUTPUT_CSV, encoding='utf-8')
             if 'url' in existing_df.columns:
@@ -132,8 +163,7 @@ def get_existing_articles():
                 existing_titles = set(existing_df['title'].values)
             logger.info(f"Found {len(existing_urls)} existing articles in the CSV")
         except Exception as e:
-            logger.error(f"Error reading existing CSV: {e}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error reading existing CSV: {e}", exc_info=True)
             # If we can't read the existing file, it might be corrupted
             backup_filename = f"output/dhaka_post_backup_{int(time.time())}.csv"
             try:
@@ -149,33 +179,44 @@ def get_article_links_from_page(url):
     """Extract article links from a specific page"""
     logger.info(f"Fetching article links from {url}")
     try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
-        response.raise_for_status()
+        with metrics.stage('listing_fetch') as timer:
+            response, content, encoding = upstream.get_body(url, headers=HEADERS, timeout=30,
+                                                            hedge=upstream.HEDGE_LISTINGS)
+            response.raise_for_status()
+            timer.bytes = len(content)
     except Exception as e:
         logger.error(f"Error fetching page {url}: {e}")
         return []
     
+    with metrics.stage('listing_parse'):
+        return parse_article_links(content.decode(encoding, errors='replace'), url)
+
+def parse_article_links(html, url, parser=HTML_PARSER):
+    """Extract article links from the HTML of a listing page"""
+    from bs4 import BeautifulSoup
+    
+    site = sites.site_for_url(url)
     try:
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, parser)
         article_links = []
         
         # Find all potential article containers
-        article_containers = soup.select('.card, .news-item, article, .list-item, .news-card, .news-list, .article-list')
+        article_containers = site.listing_containers.select(soup) if site.listing_containers else []
         
-        if not article_containers:
+        if not article_containers and site.listing_fallback_containers:
             # Look for news entries in flexible ways
-            article_containers = soup.select('div[class*="news"], div[class*="article"], div[class*="post"], a[href*="/news/"]')
+            article_containers = site.listing_fallback_containers.select(soup)
         
         if not article_containers:
             # Fallback: look for all links
             article_containers = [soup]
         
-        logger.info(f"Found {len(article_containers)} potential article containers on {url}")
+        logger.debug(f"Found {len(article_containers)} potential article containers on {url}")
         
         # Try to find pagination links to understand structure
-        pagination = soup.select('.pagination a, .page-navigation a, a[href*="page="]')
+        pagination = site.pagination_links.select(soup) if site.pagination_links else []
         if pagination:
-            logger.info(f"Found pagination with {len(pagination)} links")
+            logger.debug(f"Found pagination with {len(pagination)} links")
         
         for container in article_containers:
             links = container.find_all('a')
@@ -189,14 +230,7 @@ def get_article_links_from_page(url):
                     continue
                     
                 # Check if it looks like an article link
-                article_indicators = [
-                    '/news/', '/article/', '/story/', '/latest-news/',
-                    '/bangladesh/', '/world/', '/sports/', '/entertainment/'
-                ]
-                
-                is_article = any(indicator in href for indicator in article_indicators)
-                
-                if is_article:
+                if site.is_article_link(href):
                     # Make sure it's a full URL
                     full_url = urljoin(url, href)
                     
@@ -208,25 +242,25 @@ def get_article_links_from_page(url):
         logger.info(f"Extracted {len(article_links)} article links from {url}")
         return article_links
     except Exception as e:
-        logger.error(f"Error parsing page {url}: {e}")
-        logger.error(traceback.format_exc())
+        metrics.record_error('listing_parse', e)
+        logger.error(f"Error parsing page {url}: {e}", exc_info=True)
         return []
 
-def get_article_links():
-    """Extract article links from Dhaka Post across multiple categories and pages"""
+def get_article_links(site, categories=None):
+    """Extract article links from a site's listing pages, following pagination as needed"""
     all_links = []
     
     # First try the main category URLs
-    for category_url in CATEGORY_URLS:
+    for category_url in site.listing_urls_for(categories):
         try:
             links = get_article_links_from_page(category_url)
             all_links.extend(links)
             
             # Check if we need to try pagination (only if we don't have enough links yet)
-            if len(set(all_links)) < MIN_ARTICLES * 2:  # Get 2x the minimum to account for filtering
-                # Try up to 3 pages of pagination
-                for page in range(2, 5):
-                    paginated_url = f"{category_url}{PAGINATION_PATTERN.format(page)}"
+            if len(set(all_links)) < site.min_articles * 2:  # Get 2x the minimum to account for filtering
+                # Try the following pages of pagination
+                for page in range(2, site.max_pages + 1):
+                    paginated_url = f"{category_url}{site.pagination.format(page)}"
                     logger.info(f"Trying pagination: {paginated_url}")
                     page_links = get_article_links_from_page(paginated_url)
                     
@@ -236,53 +270,130 @@ def get_article_links():
                         # If we get no links, pagination might not work this way
                         break
                         
-                    if len(set(all_links)) >= MIN_ARTICLES * 3:
+                    if len(set(all_links)) >= site.min_articles * 3:
                         break
                         
                     # Be nice to the server
-                    time.sleep(2)
+                    time.sleep(site.request_delay)
             
             # Be nice to the server
-            time.sleep(2)
+            time.sleep(site.request_delay)
         except Exception as e:
-            logger.error(f"Error processing category URL {category_url}: {e}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing category URL {category_url}: {e}", exc_info=True)
     
     # Return unique links
     unique_links = list(set(all_links))
-    logger.info(f"Found {len(unique_links)} unique article links across all categories")
+    logger.info(f"Found {len(unique_links)} unique article links across all categories of {site.name}")
     return unique_links
 
-def extract_article_content(url):
-    """Extract the content of an article and check if it was published today or yesterday"""
+def discover_article_links(site, existing_urls, categories=None, save_state=True):
+    """Find new article links from a site's sitemaps/feeds, falling back to its HTML listings"""
+    if discovery.DISCOVERY_MODE != 'html':
+        feed_urls = site.feed_urls or (discovery.FEED_URLS if site.name == sites.DEFAULT_SITE else [])
+        finder = discovery.FeedDiscovery(site.base_url, HEADERS, feed_urls,
+                                         state_path=discovery.DISCOVERY_STATE_FILE.format(site=site.name))
+        links = finder.discover(existing_urls, save_state=save_state)
+        if links is not None:
+            return links
+        if discovery.DISCOVERY_MODE == 'feeds':
+            logger.warning(f"No sitemap or feed could be read for {site.name}")
+            return []
+        logger.info(f"No readable sitemap or feed for {site.name}, falling back to category pages")
+    return get_article_links(site, categories)
+
+def fetch_article(url, archive_raw=True):
+    """Download an article page and return (raw bytes, resolved encoding), or None on failure"""
     logger.info(f"Extracting content from {url}")
     
     try:
-        response = requests.get(url, headers=HEADERS, timeout=30)
-        response.raise_for_status()
+        with metrics.stage('article_fetch') as timer:
+            response, content, encoding = upstream.get_body(url, headers=HEADERS, timeout=30)
+            response.raise_for_status()
+            timer.bytes = len(content)
     except Exception as e:
         logger.error(f"Error fetching article: {e}")
         return None
     
+    # Keep the raw page so later extractor changes can be re-run offline
+    raw_archive = archive.default_archive() if archive_raw else None
+    if raw_archive is not None:
+        try:
+            raw_archive.append(url, content, encoding, response.status_code,
+                               response.headers.get('Content-Type'))
+        except OSError as e:
+            logger.warning(f"Could not archive {url}: {e}")
+    
+    return content, encoding
+
+def extract_article_content(url, archive_raw=True):
+    """Extract the content of an article and check if it was published today or yesterday"""
+    fetched = fetch_article(url, archive_raw)
+    if fetched is None:
+        return None
+    
+    content, encoding = fetched
+    with metrics.stage('article_parse'):
+        html = content.decode(encoding, errors='replace') if encoding else content
+        return parse_article(html, url)
+
+def crawl_site(site, existing_urls, parse_workers=pipeline.PARSE_WORKERS, categories=None, dry_run=False):
+    """Discover one site's new links and return an iterator of (link, article data or None)"""
+    article_links = discover_article_links(site, existing_urls, categories, save_state=not dry_run)
+    
+    # Filter out already processed articles, and other categories' articles
+    new_links = [link for link in article_links if link not in existing_urls
+                 and (not categories or site.category_for(link).casefold() in categories)]
+    logger.info(f"Found {len(new_links)} potential new articles to process on {site.name}")
+    return iter_extracted_articles(new_links, site, parse_workers, archive_raw=not dry_run)
+
+def iter_extracted_articles(links, site, parse_workers=pipeline.PARSE_WORKERS, archive_raw=True):
+    """Yield (link, article data or None) for each link, one at a time or through the pipeline"""
+    if not pipeline.PIPELINE_MODE:
+        for link in links:
+            yield link, extract_article_content(link, archive_raw)
+            # Brief pause between article requests
+            time.sleep(site.request_delay)
+        return
+    
+    def paced_fetch(url):
+        # Each fetch thread keeps the site's gap between its own requests
+        fetched = fetch_article(url, archive_raw)
+        time.sleep(site.request_delay)
+        return fetched
+    
+    logger.info(f"Pipeline mode for {site.name}: {site.concurrency} fetch threads, {parse_workers} parse processes")
+    yield from pipeline.run_pipeline(links, paced_fetch, parse_article,
+                                     fetch_workers=site.concurrency, parse_workers=parse_workers,
+                                     preload=(parse_article.__module__, 'bs4', 'soupsieve'))
+
+def parse_article(html, url, parser=HTML_PARSER, strict=False):
+    """Extract article fields from the HTML of an article page
+    
+    With strict the title must come from the site's title selectors and a
+    page without content is a failure, not a placeholder record. Revisits use
+    it so a selector miss does not overwrite good stored text.
+    """
+    from bs4 import BeautifulSoup
+    
+    site = sites.site_for_url(url)
     try:
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, parser)
         
         # Extract title
         title = None
-        title_selectors = ['h1', '.article-title', '.news-title', '.title', '.headline', '.entry-title']
-        for selector in title_selectors:
-            title_elements = soup.select(selector)
-            if title_elements and title_elements[0].text.strip():
-                title = title_elements[0].text.strip()
-                logger.info(f"Found title: {title}")
+        for selector in site.title_selectors:
+            title_element = selector.select_one(soup)
+            if title_element and title_element.text.strip():
+                title = title_element.text.strip()
+                logger.debug(f"Found title: {title}")
                 break
         
-        if not title:
+        if not title and not strict:
             # Try to find any large text that might be a title
             for heading in soup.find_all(['h1', 'h2']):
                 if heading.text.strip() and len(heading.text.strip()) > 15:
                     title = heading.text.strip()
-                    logger.info(f"Found title from heading: {title}")
+                    logger.debug(f"Found title from heading: {title}")
                     break
         
         if not title:
@@ -291,28 +402,21 @@ def extract_article_content(url):
         
         # Extract date
         date_text = "No date found"
-        date_selectors = [
-            'time', '.date', '.published-date', '.article-date', 
-            '[itemprop="datePublished"]', '.time', '.timestamp',
-            '.publish-time', '.meta-date', '.post-date',
-            '.entry-date', '.article-info time'
-        ]
-        
-        for selector in date_selectors:
-            date_elements = soup.select(selector)
-            if date_elements:
+        for selector in site.date_selectors:
+            date_element = selector.select_one(soup)
+            if date_element:
                 # Try to get datetime attribute first
-                dt_attr = date_elements[0].get('datetime')
+                dt_attr = date_element.get('datetime')
                 if dt_attr:
                     date_text = dt_attr
-                    logger.info(f"Found date from datetime attribute: {date_text}")
+                    logger.debug(f"Found date from datetime attribute: {date_text}")
                     break
                 
                 # Otherwise use the text content
-                date_content = date_elements[0].text.strip()
+                date_content = date_element.text.strip()
                 if date_content:
                     date_text = date_content
-                    logger.info(f"Found date from text: {date_text}")
+                    logger.debug(f"Found date from text: {date_text}")
                     break
         
         # If date not found in specific elements, try regex pattern in the page
@@ -321,42 +425,34 @@ def extract_article_content(url):
             for tag in soup.find_all(['span', 'div', 'p']):
                 if tag.string and date_pattern.search(str(tag.string)):
                     date_text = date_pattern.search(str(tag.string)).group()
-                    logger.info(f"Found date using regex: {date_text}")
+                    logger.debug(f"Found date using regex: {date_text}")
                     break
         
         # We're being less strict here - let the article through even if we can't verify the date
         # This is one of the key fixes
         is_recent = date_text == "No date found" or is_today_or_yesterday(date_text)
         if not is_recent:
-            logger.info(f"Article not from today or yesterday. Date: {date_text}")
+            logger.debug(f"Article not from today or yesterday. Date: {date_text}")
             # Commented out the return None to be more lenient with dates
             # return None
         
         # Extract content
         content = ""
-        content_selectors = [
-            'article p', '.article-body p', '.content p', 
-            '#content p', '.news-content p', '.story p',
-            '.description p', '.article-description p',
-            '.entry-content p', '.article-text p',
-            '.news-details p', '.post-content p'
-        ]
-        
-        for selector in content_selectors:
-            paragraphs = soup.select(selector)
+        for selector_text, selector in site.content_selectors:
+            paragraphs = selector.select(soup)
             if paragraphs:
                 for p in paragraphs:
                     # Skip very short paragraphs (likely not content)
-                    if len(p.text.strip()) > 20:
+                    if len(p.text.strip()) > site.min_paragraph_length:
                         content += p.text.strip() + "\n\n"
                 # If we found content, break
                 if content:
-                    logger.info(f"Found content using {selector}")
+                    logger.debug(f"Found content using {selector_text}")
                     break
         
         # Fallback: get all paragraphs if no content found yet
+        article_container = site.find_container(soup)
         if not content:
-            article_container = soup.find('article') or soup.select_one('.article, .article-body, .story-content, .entry-content, .news-details')
             if article_container:
                 paragraphs = article_container.find_all('p')
             else:
@@ -364,20 +460,21 @@ def extract_article_content(url):
                 
             for p in paragraphs:
                 # Skip very short paragraphs
-                if len(p.text.strip()) > 20:
+                if len(p.text.strip()) > site.min_paragraph_length:
                     content += p.text.strip() + "\n\n"
         
         content = content.strip()
         
         # Be more lenient with empty content - extract at least title and URL
         if not content:
+            if strict:
+                logger.warning(f"No content found at {url}")
+                return None
             logger.warning("No content found, but continuing with metadata only")
-            content = "Content not available"
+            content = MISSING_CONTENT
         
         # Extract images
         img_urls = []
-        article_container = soup.find('article') or soup.select_one('.article, .article-body, .story-content, .entry-content, .news-details')
-        
         if article_container:
             img_elements = article_container.find_all('img')
         else:
@@ -387,8 +484,7 @@ def extract_article_content(url):
             img_url = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
             if img_url:
                 # Exclude common non-content images
-                exclude_patterns = ['icon', 'logo', 'blank.gif', 'pixel.gif', 'advertisement', 'banner', 'avatar', 'thumb', '1x1']
-                if not any(pattern in img_url.lower() for pattern in exclude_patterns):
+                if not any(pattern in img_url.lower() for pattern in site.image_exclude):
                     # Check if image is large enough (if dimensions are provided)
                     width = img.get('width')
                     height = img.get('height')
@@ -397,7 +493,7 @@ def extract_article_content(url):
                     if width and height:
                         try:
                             w, h = int(width), int(height)
-                            if w < 100 or h < 100:
+                            if w < site.min_image_size or h < site.min_image_size:
                                 is_large_enough = False
                         except ValueError:
                             pass
@@ -406,40 +502,17 @@ def extract_article_content(url):
                         full_img_url = urljoin(url, img_url)
                         if full_img_url not in img_urls:
                             img_urls.append(full_img_url)
-                            logger.info(f"Found image: {full_img_url}")
-        
-        # Try to identify the article category
-        category = "General"
-        url_path = urllib.parse.urlparse(url).path
-        
-        if "/bangladesh/" in url_path:
-            category = "Bangladesh"
-        elif "/world/" in url_path:
-            category = "World"
-        elif "/sports/" in url_path:
-            category = "Sports"
-        elif "/entertainment/" in url_path:
-            category = "Entertainment"
-        elif "/business/" in url_path:
-            category = "Business"
-        elif "/tech/" in url_path or "/technology/" in url_path:
-            category = "Technology"
-        elif "/opinion/" in url_path:
-            category = "Opinion"
-        elif "/lifestyle/" in url_path:
-            category = "Lifestyle"
+                            logger.debug(f"Found image: {full_img_url}")
+        
+        # Identify the article category from the URL path
+        category = site.category_for(url)
         
         # Try to extract author
         author = "Unknown"
-        author_selectors = [
-            '.author', '.reporter', '.byline', '[rel="author"]',
-            '.writer', '.article-author', '.post-author'
-        ]
-        
-        for selector in author_selectors:
-            author_elements = soup.select(selector)
-            if author_elements and author_elements[0].text.strip():
-                author = author_elements[0].text.strip()
+        for selector in site.author_selectors:
+            author_element = selector.select_one(soup)
+            if author_element and author_element.text.strip():
+                author = author_element.text.strip()
                 break
         
         # Create the article data dictionary - added new fields
@@ -448,16 +521,16 @@ def extract_article_content(url):
             'date': date_text,
             'url': url,
             'content': content,
-            'image_urls': img_urls,
+            'images': img_urls,
             'category': category,
             'author': author,
-            'timestamp': get_bangladesh_time().strftime('%Y-%m-%d %H:%M:%S')
+            'scraped_at': get_bangladesh_time().strftime('%Y-%m-%d %H:%M:%S')
         }
         
         return article_data
     except Exception as e:
-        logger.error(f"Error parsing article {url}: {e}")
-        logger.error(traceback.format_exc())
+        metrics.record_error('article_parse', e)
+        logger.error(f"Error parsing article {url}: {e}", exc_info=True)
         return None
 
 def create_safe_filename(title, url):
@@ -504,49 +577,126 @@ def download_image(img_url, article_title, url):
         
         # Don't re-download if the file already exists
         if os.path.exists(local_path):
-            logger.info(f"Image already exists: {local_path}")
+            logger.debug(f"Image already exists: {local_path}")
             return local_path
         
         # Download the image
-        response = requests.get(img_url, headers=HEADERS, stream=True, timeout=30)
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            logger.info(f"Downloaded image: {local_path}")
-            return local_path
-        else:
-            logger.warning(f"Failed to download image: {img_url}")
-            return None
+        with metrics.stage('image_download') as timer:
+            response = upstream.get(img_url, headers=HEADERS, stream=True, timeout=30)
+            if response.status_code == 200:
+                with open(local_path, 'wb') as f:
+                    for chunk in upstream.iter_body(response, chunk_size=8192):
+                        f.write(chunk)
+                        timer.bytes += len(chunk)
+                logger.debug(f"Downloaded image: {local_path}")
+                return local_path
+            else:
+                upstream.body_read(response)
+                metrics.record_error('image_download', category='http', status=response.status_code)
+                logger.warning(f"Failed to download image: {img_url}")
+                return None
     except Exception as e:
         logger.error(f"Error downloading image {img_url}: {e}")
         return None
 
-def process_new_articles():
-    """Process new articles and add them to the CSV"""
-    # Get existing articles
-    existing_urls, existing_titles = get_existing_articles()
+def read_csv_header(path):
+    """Return the header row of a CSV file, or None if it can't be read"""
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return next(csv.reader(f), None)
+    except (OSError, csv.Error, UnicodeDecodeError):
+        return None
+
+def append_csv_rows(path, rows):
+    """Append rows to an existing CSV in the same format pandas writes"""
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        writer.writerows(rows)
+
+def publish_snapshot():
+    """Write the memory-mapped snapshot the API workers read from"""
+    try:
+        with _snapshot_lock, metrics.stage('snapshot_write') as timer:
+            article_store.refresh()
+            write_snapshot(article_store.all(), SNAPSHOT_PATH)
+            timer.bytes = os.path.getsize(SNAPSHOT_PATH)
+    except Exception as e:
+        logger.error(f"Error writing snapshot: {e}", exc_info=True)
+
+def get_near_duplicate_index():
+    """Load the SimHash index once and fingerprint any stored articles it is missing"""
+    import neardup
+    
+    global _near_duplicates
+    # Also reloaded after retention (perhaps in another process) dropped old fingerprints
+    if _near_duplicates is None or _near_duplicates.changed_on_disk(neardup.NEAR_DUP_INDEX):
+        _near_duplicates = neardup.SimHashIndex.load(neardup.NEAR_DUP_INDEX)
+    article_store.refresh()
+    added = _near_duplicates.sync(article_store.all())
+    if added:
+        logger.info(f"Fingerprinted {added} stored articles for near-duplicate checks")
+    return _near_duplicates
+
+def save_near_duplicates(fingerprints):
+    """Add (url, fingerprint) pairs of committed articles to the index and save it
+
+    Call with the store's write lock held, which retention holds while it prunes the file.
+    """
+    import neardup
+    
+    global _near_duplicates
+    if _near_duplicates is None or _near_duplicates.changed_on_disk(neardup.NEAR_DUP_INDEX):
+        _near_duplicates = neardup.SimHashIndex.load(neardup.NEAR_DUP_INDEX)
+    for url, fingerprint in fingerprints:
+        _near_duplicates.add(url, fingerprint)
+    _near_duplicates.save(neardup.NEAR_DUP_INDEX)
+
+def record_rollups(new_articles):
+    """Count newly committed articles into the /stats rollups; call with the store's write lock held"""
+    global _rollups
+    if _rollups is None and not os.path.exists(rollups.STATS_PATH):
+        # First run with rollups: count everything stored so far, these articles included
+        counted = rollups.rebuild(OUTPUT_CSV, path=rollups.STATS_PATH)
+        logger.info(f"Built article statistics from {counted} stored articles")
+        _rollups = rollups.Rollups(rollups.STATS_PATH).load()
+        return
+    if _rollups is None:
+        _rollups = rollups.Rollups(rollups.STATS_PATH)
+    # Picks up a rebuild done from the command line in the meantime
+    _rollups.load()
+    _rollups.add(new_articles)
+    _rollups.save()
+
+def process_new_articles(categories=None, dry_run=False):
+    """Process new articles and add them to the CSV; returns the new articles
+    
+    categories limits the crawl to those category names. With dry_run the
+    articles are discovered and extracted but nothing is downloaded or written.
+    """
+    import neardup
+    import pandas as pd
     
-    # Get article links
-    article_links = get_article_links()
+    categories = {category.casefold() for category in categories} if categories else None
     
-    # Filter out already processed articles
-    new_links = [link for link in article_links if link not in existing_urls]
-    logger.info(f"Found {len(new_links)} potential new articles to process")
+    # Get existing articles, including those recently rotated out of the CSV
+    existing_urls, existing_titles = get_existing_articles()
+    existing_urls |= retention.known_urls()
     
     new_articles = []
     processed_titles = set()
+    near_duplicates = get_near_duplicate_index()
+    # Fingerprints of this run's articles; they join the saved index only once stored
+    run_fingerprints = neardup.SimHashIndex()
+    pending_fingerprints = []
     
-    # Process articles until we have at least MIN_ARTICLES or run out of links
-    for link in new_links:
+    # Crawl every site at once; each stops after its minimum number of articles
+    site_list = sites.all_sites()
+    site_counts = {site.name: 0 for site in site_list}
+    parse_workers = max(1, pipeline.PARSE_WORKERS // max(len(site_list), 1))
+    crawler = crawl.SiteCrawler(site_list, lambda site: crawl_site(site, existing_urls, parse_workers,
+                                                                   categories, dry_run))
+    for site, link, article_data in crawler.results():
         try:
-            # Check if we've reached our minimum goal
-            if len(new_articles) >= MIN_ARTICLES:
-                logger.info(f"Reached minimum goal of {MIN_ARTICLES} articles")
-                break
-            
-            # Extract article content
-            article_data = extract_article_content(link)
             if not article_data:
                 continue
             
@@ -555,9 +705,17 @@ def process_new_articles():
                 logger.info(f"Skipping duplicate article by title: {article_data['title']}")
                 continue
             
+            # Check for the same story under another URL or a reworded headline
+            fingerprint = neardup.simhash(article_data['content'])
+            match = near_duplicates.find(fingerprint, exclude_url=link) or run_fingerprints.find(fingerprint)
+            if match:
+                logger.info(f"Skipping near-duplicate of {match[0]} ({match[1]} bits apart): {article_data['title']}")
+                metrics.NEAR_DUPLICATES.inc()
+                continue
+            
             # Download images
             local_images = []
-            for img_url in article_data['image_urls'][:3]:  # Limit to first 3 images
+            for img_url in article_data['images'][:3] if not dry_run else []:  # Limit to first 3 images
                 local_path = download_image(img_url, article_data['title'], link)
                 if local_path:
                     local_images.append(local_path)
@@ -566,93 +724,119 @@ def process_new_articles():
             article_data['local_images'] = local_images
             new_articles.append(article_data)
             processed_titles.add(article_data['title'])
+            run_fingerprints.add(link, fingerprint)
+            pending_fingerprints.append((link, fingerprint))
             
-            logger.info(f"Processed article #{len(new_articles)}: {article_data['title']}")
+            site_counts[site.name] += 1
+            logger.info(f"Processed article #{len(new_articles)} ({site.name}): {article_data['title']}")
             
-            # Brief pause between article processing
-            time.sleep(2)
+            # Check if this site has reached its minimum goal
+            if site_counts[site.name] >= site.min_articles:
+                logger.info(f"Reached minimum goal of {site.min_articles} articles for {site.name}")
+                crawler.stop(site)
         except Exception as e:
-            logger.error(f"Error processing article {link}: {e}")
-            logger.error(traceback.format_exc())
+            logger.error(f"Error processing article {link}: {e}", exc_info=True)
+    # Stops the site threads (and any pipeline workers) still running
+    crawler.close()
+    
+    if dry_run:
+        logger.info(f"Dry run: found {len(new_articles)} new articles; nothing was saved")
+        return new_articles
     
     # Save new articles to CSV
     if new_articles:
-        try:
-            # Prepare data for CSV
-            csv_data = []
-            for article in new_articles:
-                csv_row = {
-                    'title': article['title'],
-                    'date': article['date'],
-                    'url': article['url'],
-                    'content': article['content'],
-                    'category': article.get('category', 'General'),
-                    'author': article.get('author', 'Unknown'),
-                    'image_urls': ';'.join(article['image_urls']),
-                    'local_images': ';'.join(article['local_images']),
-                    'scraped_at': article['timestamp']
-                }
-                csv_data.append(csv_row)
-            
-            new_df = pd.DataFrame(csv_data)
-            
-            if os.path.exists(OUTPUT_CSV):
-                # Try to read existing CSV
+        write_start = time.perf_counter()
+        size_before = os.path.getsize(OUTPUT_CSV) if os.path.exists(OUTPUT_CSV) else 0
+        # Rotation and revisits rewrite the same file; hold the store's write lock
+        with write_lock(OUTPUT_CSV):
+            try:
+                # Prepare data for CSV
+                csv_data = [article_to_row(article) for article in new_articles]
+                
+                new_df = pd.DataFrame(csv_data, columns=CSV_COLUMNS)
+                
+                if read_csv_header(OUTPUT_CSV) == CSV_COLUMNS:
+                    # Append only the new rows so readers can tail the file
+                    append_csv_rows(OUTPUT_CSV, csv_data)
+                    logger.info(f"Appended {len(new_articles)} new articles to {OUTPUT_CSV}")
+                elif os.path.exists(OUTPUT_CSV):
+                    # Try to read existing CSV
+                    try:
+                        existing_df = pd.read_csv(OUTPUT_CSV, encoding='utf-8')
+                        
+                        # Check if the column structures match
+                        missing_cols = set(new_df.columns) - set(existing_df.columns)
+                        if missing_cols:
+                            logger.info(f"Adding new columns to existing CSV: {missing_cols}")
+                            for col in missing_cols:
+                                existing_df[col] = ""
+                        
+                        # Ensure all new columns exist in the new dataframe too
+                        for col in existing_df.columns:
+                            if col not in new_df.columns:
+                                new_df[col] = ""
+                        
+                        # Ensure column order matches
+                        new_df = new_df[existing_df.columns]
+                        
+                        # Append to existing CSV
+                        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+                        combined_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+                        logger.info(f"Added {len(new_articles)} new articles to {OUTPUT_CSV}")
+                    except Exception as e:
+                        metrics.record_error('store_write', e)
+                        logger.error(f"Error appending to CSV: {e}", exc_info=True)
+                        
+                        # Make a backup of the existing file
+                        if os.path.exists(OUTPUT_CSV):
+                            backup_file = f"output/dhaka_post_today_backup_{int(time.time())}.csv"
+                            try:
+                                os.rename(OUTPUT_CSV, backup_file)
+                                logger.info(f"Backed up existing CSV to {backup_file}")
+                            except Exception as e2:
+                                logger.error(f"Failed to backup existing CSV: {e2}")
+                        
+                        # Create a new file
+                        new_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+                        logger.info(f"Created new CSV with {len(new_articles)} articles after error")
+                else:
+                    # Create new CSV
+                    new_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+                    logger.info(f"Saved {len(new_articles)} articles to new CSV: {OUTPUT_CSV}")
+                
+                logger.info(f"Successfully processed {len(new_articles)} new articles")
+                # Under the same lock, so a CLI run next to the daemon cannot lose counts
                 try:
-                    existing_df = pd.read_csv(OUTPUT_CSV, encoding='utf-8')
-                    
-                    # Check if the column structures match
-                    missing_cols = set(new_df.columns) - set(existing_df.columns)
-                    if missing_cols:
-                        logger.info(f"Adding new columns to existing CSV: {missing_cols}")
-                        for col in missing_cols:
-                            existing_df[col] = ""
-                    
-                    # Ensure all new columns exist in the new dataframe too
-                    for col in existing_df.columns:
-                        if col not in new_df.columns:
-                            new_df[col] = ""
-                    
-                    # Ensure column order matches
-                    new_df = new_df[existing_df.columns]
-                    
-                    # Append to existing CSV
-                    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-                    combined_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
-                    logger.info(f"Added {len(new_articles)} new articles to {OUTPUT_CSV}")
+                    record_rollups(new_articles)
                 except Exception as e:
-                    logger.error(f"Error appending to CSV: {e}")
-                    logger.error(traceback.format_exc())
-                    
-                    # Make a backup of the existing file
-                    if os.path.exists(OUTPUT_CSV):
-                        backup_file = f"output/dhaka_post_today_backup_{int(time.time())}.csv"
-                        try:
-                            os.rename(OUTPUT_CSV, backup_file)
-                            logger.info(f"Backed up existing CSV to {backup_file}")
-                        except Exception as e2:
-                            logger.error(f"Failed to backup existing CSV: {e2}")
-                    
-                    # Create a new file
-                    new_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
-                    logger.info(f"Created new CSV with {len(new_articles)} articles after error")
-            else:
-                # Create new CSV
-                new_df.to_csv(OUTPUT_CSV, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
-                logger.info(f"Saved {len(new_articles)} articles to new CSV: {OUTPUT_CSV}")
-            
-            logger.info(f"Successfully processed {len(new_articles)} new articles")
-        except Exception as e:
-            logger.error(f"Error saving to CSV: {e}")
-            logger.error(traceback.format_exc())
-            
-            # Emergency backup - at least save the data somewhere
-            emergency_file = f"output/dhaka_post_emergency_{int(time.time())}.csv"
+                    logger.error(f"Error updating article statistics: {e}", exc_info=True)
+                # Only articles in the store count as seen; an unsaved one is fetched again next run
+                try:
+                    save_near_duplicates(pending_fingerprints)
+                except Exception as e:
+                    logger.error(f"Error saving near-duplicate index: {e}", exc_info=True)
+            except Exception as e:
+                metrics.record_error('store_write', e)
+                logger.error(f"Error saving to CSV: {e}", exc_info=True)
+                
+                # Emergency backup - at least save the data somewhere
+                emergency_file = f"output/dhaka_post_emergency_{int(time.time())}.csv"
+                try:
+                    pd.DataFrame(csv_data).to_csv(emergency_file, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
+                    logger.info(f"Created emergency backup at {emergency_file}")
+                except Exception as e2:
+                    logger.error(f"Failed to create emergency backup: {e2}")
+        
+        size_after = os.path.getsize(OUTPUT_CSV) if os.path.exists(OUTPUT_CSV) else 0
+        written = size_after - size_before if size_after >= size_before else size_after
+        metrics.observe('store_write', time.perf_counter() - write_start, written)
+        publish_snapshot()
+        if parquet_export.PARQUET_ENABLED:
             try:
-                pd.DataFrame(csv_data).to_csv(emergency_file, index=False, quoting=csv.QUOTE_ALL, encoding='utf-8')
-                logger.info(f"Created emergency backup at {emergency_file}")
-            except Exception as e2:
-                logger.error(f"Failed to create emergency backup: {e2}")
+                with metrics.stage('parquet_export'):
+                    parquet_export.export_articles(new_articles)
+            except Exception as e:
+                logger.error(f"Error writing Parquet export: {e}", exc_info=True)
     else:
         logger.info("No new articles found to process")
     
@@ -668,18 +852,54 @@ def process_new_articles():
     logger.info(f"Total articles in database: {total_articles}")
     if total_articles < MIN_ARTICLES:
         logger.warning(f"Failed to reach minimum goal of {MIN_ARTICLES} articles. Currently have {total_articles}.")
+    return new_articles
+
+def revisit_recent_articles():
+    """Re-check recently scraped articles for edits and update the ones that changed"""
+    if not os.path.exists(OUTPUT_CSV):
+        return
+    article_store.refresh()
+    stored = {article['url']: article for article in article_store.all()}
+    parse = functools.partial(parse_article, strict=True)
+    counts = revisit.run_revisits(get_revisit_state(), stored, parse, HEADERS, OUTPUT_CSV, delay=REQUEST_DELAY)
+    if counts:
+        logger.info(f"Revisited {sum(counts.values())} articles: {counts}")
+    if counts.get('changed'):
+        publish_snapshot()
 
-def run_scraper():
-    """Run the scraper job"""
+def run_scraper(categories=None):
+    """Run the scraper job; returns False if the scrape itself failed"""
     logger.info("-" * 60)
     logger.info(f"Starting Dhaka Post scraper at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    init()
+    stages_before = metrics.stage_snapshot()
+    ok = True
     try:
-        process_new_articles()
+        process_new_articles(categories)
     except Exception as e:
-        logger.error(f"Error in scraper job: {e}")
-        logger.error(traceback.format_exc())
+        ok = False
+        logger.error(f"Error in scraper job: {e}", exc_info=True)
+    
+    # Revisits cover every category, so a run scoped to a few skips them
+    if revisit.REVISIT_ENABLED and not categories:
+        try:
+            revisit_recent_articles()
+        except Exception as e:
+            logger.error(f"Error revisiting articles: {e}", exc_info=True)
+    
+    # Per-stage summary for this run, plus a Prometheus textfile for the API's /metrics
+    for line in metrics.format_stage_summary(stages_before, metrics.stage_snapshot()):
+        logger.info(f"Stage {line}")
+    for host, state in upstream.snapshot().items():
+        logger.info(f"Upstream {host}: circuit {state['circuit']}, p50 {state['p50_seconds']}s, "
+                    f"p99 {state['p99_seconds']}s, read timeout {state['read_timeout_seconds']}s")
+    try:
+        metrics.write_textfile(metrics.SCRAPER_METRICS_FILE)
+    except Exception as e:
+        logger.error(f"Error writing metrics file: {e}")
     logger.info(f"Completed scraper job at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     logger.info("-" * 60)
+    return ok
 
 def scheduled_job():
     """Function to be scheduled"""
@@ -691,12 +911,13 @@ def verify_csv_structure():
         logger.info(f"CSV file {OUTPUT_CSV} does not exist yet")
         return
     
+    import pandas as pd
+    
     try:
         df = pd.read_csv(OUTPUT_CSV, encoding='utf-8')
         logger.info(f"CSV structure verified: {len(df)} rows, {list(df.columns)} columns")
     except Exception as e:
-        logger.error(f"Error verifying CSV structure: {e}")
-        logger.error(traceback.format_exc())
+        logger.error(f"Error verifying CSV structure: {e}", exc_info=True)
         
         backup_file = f"output/dhaka_post_corrupted_{int(time.time())}.csv"
         try:
@@ -705,20 +926,29 @@ def verify_csv_structure():
         except Exception as e2:
             logger.error(f"Failed to move corrupted CSV: {e2}")
 
-def main():
+def run_schedule(interval=SCHEDULE_INTERVAL):
+    """Scrape now and then every interval minutes until interrupted"""
+    import schedule
+    
     logger.info("Dhaka Post Today Scraper")
     logger.info("=" * 60)
     logger.info(f"Current time in Bangladesh: {get_bangladesh_time().strftime('%Y-%m-%d %H:%M:%S')}")
     
     # Verify CSV structure
     verify_csv_structure()
+    publish_snapshot()
+    
+    # Rotate old articles and collect unreferenced images alongside the scrapes
+    if retention.RETENTION_ENABLED:
+        retention.RetentionJob(on_rotated=publish_snapshot).start()
+        logger.info(f"Retention job running every {retention.RETENTION_INTERVAL:g}s")
     
     # Run immediately at startup
     run_scraper()
     
-    # Schedule to run every 10 minutes
-    schedule.every(10).minutes.do(scheduled_job)
-    logger.info("Scraper scheduled to run every 10 minutes")
+    # Schedule to run every interval minutes
+    schedule.every(interval).minutes.do(scheduled_job)
+    logger.info(f"Scraper scheduled to run every {interval:g} minutes")
     
     # Keep running
     try:
@@ -733,5 +963,44 @@ def main():
     
     return 0
 
+def dry_run(categories=None):
+    """Print the articles a run would add, one JSON object per line, without saving anything"""
+    articles = process_new_articles(categories, dry_run=True)
+    for article in articles:
+        print(json.dumps({
+            'url': article['url'],
+            'title': article['title'],
+            'category': article['category'],
+            'date': article['date'],
+            'images': len(article['images']),
+            'content_chars': len(article['content']),
+        }, ensure_ascii=False))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Scrape Dhaka Post articles into {OUTPUT_CSV}")
+    parser.add_argument("-q", "--quiet", action="store_true", help="log to scraper.log only, not the console")
+    sub = parser.add_subparsers(dest="command", metavar="command")
+    once = sub.add_parser("once", help="scrape once and exit (for cron and container jobs)")
+    once.add_argument("--category", action="append", help="only this category; may be repeated")
+    dry = sub.add_parser("dry-run", help="discover and extract new articles without saving anything")
+    dry.add_argument("--category", action="append", help="only this category; may be repeated")
+    every = sub.add_parser("schedule", help="scrape now and then on an interval (the default)")
+    every.add_argument("--interval", type=float, default=SCHEDULE_INTERVAL, help="minutes between runs")
+    sub.add_parser("categories", help="list the categories of each site")
+    args = parser.parse_args(argv)
+    
+    if args.command == "categories":
+        for site in sites.all_sites():
+            print(f"{site.name}: {', '.join(site.categories())}")
+        return 0
+    
+    init(console=not args.quiet)
+    if args.command == "once":
+        return 0 if run_scraper(args.category) else 1
+    if args.command == "dry-run":
+        return dry_run(args.category)
+    return run_schedule(getattr(args, 'interval', SCHEDULE_INTERVAL))
+
 if __name__ == "__main__":
     sys.exit(main())
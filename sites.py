@@ -0,0 +1,169 @@
+# ======================= declarative per-site adapters ===============
+#
+# Each news source is described by a JSON file in sites/ (see
+# sites/dhakapost.json): listing pages, CSS selectors, URL-path category rules
+# and politeness limits. Files are loaded and their selectors compiled once,
+# on first use; the scraper and API then look adapters up by URL host.
+#
+#   SCRAPER_SITES=dhakapost,other   # crawl only these (default: every enabled file)
+import json
+import logging
+import os
+import threading
+from urllib.parse import urljoin, urlparse
+
+logger = logging.getLogger(__name__)
+
+SITES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sites")
+DEFAULT_SITE = "dhakapost"
+ENABLED_SITES = [name.strip() for name in os.environ.get("SCRAPER_SITES", "").split(",") if name.strip()]
+
+REQUIRED_KEYS = ('name', 'base_url', 'listing_paths', 'listing', 'article')
+
+_sites = None
+_lock = threading.Lock()
+
+
+def _compile(selector):
+    import soupsieve
+
+    return soupsieve.compile(selector) if selector else None
+
+
+def _env_override(name, default, cast):
+    value = os.environ.get(name)
+    return cast(value) if value not in (None, "") else default
+
+
+class SiteAdapter:
+    """Compiled form of one site's JSON description"""
+
+    def __init__(self, config, source="<config>"):
+        missing = [key for key in REQUIRED_KEYS if key not in config]
+        if missing:
+            raise ValueError(f"{source}: missing {', '.join(missing)}")
+
+        self.name = config['name']
+        self.enabled = config.get('enabled', True)
+        base_url_env = config.get('base_url_env')
+        self.base_url = (os.environ.get(base_url_env) if base_url_env else None) or config['base_url']
+        self.hosts = {urlparse(self.base_url).netloc, urlparse(config['base_url']).netloc}
+        self.hosts.update(config.get('aliases', []))
+
+        self.listing_urls = [urljoin(self.base_url, path) for path in config['listing_paths']]
+        self.pagination = config.get('pagination', "?page={}")
+        self.max_pages = config.get('max_pages', 4)
+        self.feed_urls = [urljoin(self.base_url, url) for url in config.get('feeds', [])]
+
+        listing = config['listing']
+        self.listing_containers = _compile(listing.get('containers'))
+        self.listing_fallback_containers = _compile(listing.get('fallback_containers'))
+        self.pagination_links = _compile(listing.get('pagination_links'))
+        self.article_indicators = tuple(listing.get('article_indicators', ()))
+
+        article = config['article']
+        self.title_selectors = [_compile(s) for s in article.get('title', [])]
+        self.date_selectors = [_compile(s) for s in article.get('date', [])]
+        self.content_selectors = [(s, _compile(s)) for s in article.get('content', [])]
+        self.container_selectors = [_compile(s) for s in article.get('container', [])]
+        self.author_selectors = [_compile(s) for s in article.get('author', [])]
+        self.image_exclude = tuple(article.get('image_exclude', ()))
+        self.min_paragraph_length = article.get('min_paragraph_length', 20)
+        self.min_image_size = article.get('min_image_size', 100)
+
+        self.category_rules = [(tuple(rule['match']), rule['category']) for rule in config.get('categories', [])]
+        self.default_category = config.get('default_category', "General")
+
+        politeness = config.get('politeness', {})
+        # The environment overrides every site's limits (the load test sets these)
+        self.request_delay = _env_override("SCRAPER_REQUEST_DELAY", politeness.get('request_delay', 2.0), float)
+        self.concurrency = max(1, _env_override("SCRAPER_FETCH_WORKERS", politeness.get('concurrency', 1), int))
+        self.min_articles = _env_override("SCRAPER_MIN_ARTICLES", config.get('min_articles', 25), int)
+
+    def __repr__(self):
+        return f"<SiteAdapter {self.name} {self.base_url}>"
+
+    def owns(self, url):
+        return urlparse(url).netloc in self.hosts
+
+    def is_article_link(self, href):
+        return any(indicator in href for indicator in self.article_indicators)
+
+    def listing_urls_for(self, categories=None):
+        """Listing pages of the given (casefolded) category names, or all of them"""
+        if not categories:
+            return self.listing_urls
+        # "/sports" is matched by the same path rules as ".../sports/article-1"
+        return [url for url in self.listing_urls
+                if self.category_for(url.rstrip('/') + '/').casefold() in categories]
+
+    def categories(self):
+        return sorted({category for _, category in self.category_rules} | {self.default_category})
+
+    def category_for(self, url):
+        path = urlparse(url).path
+        for patterns, category in self.category_rules:
+            if any(pattern in path for pattern in patterns):
+                return category
+        return self.default_category
+
+    def find_container(self, soup):
+        """The element holding the article body, or None"""
+        for selector in self.container_selectors:
+            container = selector.select_one(soup)
+            if container is not None:
+                return container
+        return None
+
+
+def load_sites(directory=SITES_DIR):
+    """Read and compile every adapter in directory, sorted by name"""
+    sites = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path, encoding='utf-8') as f:
+            sites.append(SiteAdapter(json.load(f), source=path))
+    names = [site.name for site in sites]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"duplicate site names in {directory}: {', '.join(sorted(duplicates))}")
+    return sites
+
+
+def registered_sites():
+    global _sites
+    if _sites is None:
+        with _lock:
+            if _sites is None:
+                _sites = load_sites()
+                logger.debug(f"Loaded site adapters: {', '.join(site.name for site in _sites)}")
+    return _sites
+
+
+def all_sites():
+    """Adapters to crawl: the enabled ones, narrowed by SCRAPER_SITES if set"""
+    sites = [site for site in registered_sites() if site.enabled]
+    if ENABLED_SITES:
+        sites = [site for site in registered_sites() if site.name in ENABLED_SITES]
+    return sites
+
+
+def get_site(name):
+    for site in registered_sites():
+        if site.name == name:
+            return site
+    raise KeyError(name)
+
+
+def default_site():
+    return get_site(DEFAULT_SITE)
+
+
+def site_for_url(url):
+    """The adapter whose host serves url, falling back to the default site"""
+    for site in registered_sites():
+        if site.owns(url):
+            return site
+    return default_site()
@@ -0,0 +1,159 @@
+# ======================= memory-mapped article snapshot shared by API workers ===============
+#
+# Layout (little endian):
+#   header   magic(8s) count(Q)
+#   index    count x (offset(Q), length(I))   -- byte range of each article
+#   data     UTF-8 JSON documents, one per article, in commit order
+#
+# The scraper writes a new file next to the old one and swaps it in with
+# os.replace(), so readers either see the old snapshot or the new one, never a
+# half-written file. Readers mmap the file read-only; the page cache holds a
+# single copy no matter how many worker processes map it.
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = "output/articles.snapshot"
+SNAPSHOT_MAGIC = b"DPSNAP01"
+
+HEADER = struct.Struct('<8sQ')
+INDEX_ENTRY = struct.Struct('<QI')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def write_snapshot(articles, path=SNAPSHOT_PATH):
+    """Serialize articles (oldest first) and atomically replace the snapshot at path"""
+    blobs = [json.dumps(dict(article), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+             for article in articles]
+    offset = HEADER.size + INDEX_ENTRY.size * len(blobs)
+    index = bytearray()
+    for blob in blobs:
+        index += INDEX_ENTRY.pack(offset, len(blob))
+        offset += len(blob)
+
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(SNAPSHOT_MAGIC, len(blobs)))
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote snapshot with {len(blobs)} articles to {path}")
+
+
+class SnapshotReader:
+    """Read-only, memory-mapped view of the article snapshot
+
+    Articles are decoded one at a time straight from the mapping, so a worker
+    never holds the whole dataset in its own heap. refresh() costs a single
+    stat() call when nothing changed, so it is cheap enough to run per request.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._view = (None, 0)   # (mapping, article count), swapped as one
+        self._ident = None
+        self._last_url = None  # newest article seen, where the next diff starts
+        self.loaded = False
+        self.on_new = None  # called with every new article, whoever triggered the refresh
+
+    def __len__(self):
+        return self._view[1]
+
+    def refresh(self):
+        """Remap the snapshot if it was swapped and return articles added since
+
+        New articles are also passed to on_new here, so a caller that ignores
+        the result (a request remapping per call) does not take them away from
+        the watcher feeding the event stream.
+        """
+        with self._lock:
+            new_articles = self._refresh()
+            if self.on_new:
+                for article in new_articles:
+                    self.on_new(article)
+        return new_articles
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.loaded = True
+            return []
+        ident = (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+        if ident == self._ident:
+            return []
+
+        first_load = not self.loaded
+        try:
+            mm = self._map(st.st_size)
+        except (OSError, ValueError, SnapshotError) as e:
+            logger.error(f"Error mapping snapshot {self.path}: {e}")
+            return []
+        count = HEADER.unpack_from(mm, 0)[1]
+        # The previous mapping is released once no reader references it
+        self._view, self._ident = (mm, count), ident
+        self.loaded = True
+        new_articles = [] if first_load else self._added_since(mm, count)
+        if count:
+            self._last_url = new_articles[-1]['url'] if new_articles else self._get(mm, count - 1)['url']
+        return new_articles
+
+    def _added_since(self, mm, count):
+        # Rotation drops the oldest rows, so positions shift; the articles after
+        # the newest one we had seen are the new ones
+        added = []
+        for i in range(count - 1, -1, -1):
+            article = self._get(mm, i)
+            if article['url'] == self._last_url:
+                return added[::-1]
+            added.append(article)
+        if self._last_url is not None:
+            logger.warning(f"Snapshot {self.path} no longer holds the newest article seen; "
+                           f"not treating its {count} articles as new")
+            return []
+        return added[::-1]
+
+    def _map(self, size):
+        if size < HEADER.size:
+            raise SnapshotError("snapshot is truncated")
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC or HEADER.size + count * INDEX_ENTRY.size > size:
+            mm.close()
+            raise SnapshotError("bad snapshot header")
+        return mm
+
+    @staticmethod
+    def _get(mm, i):
+        offset, length = INDEX_ENTRY.unpack_from(mm, HEADER.size + i * INDEX_ENTRY.size)
+        return json.loads(mm[offset:offset + length])
+
+    def get(self, i):
+        """Decode the i-th article (0 = oldest) without touching the others"""
+        mm, count = self._view
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError(i)
+        return self._get(mm, i)
+
+    def latest(self, limit=None):
+        """Return the most recently stored articles, newest first"""
+        mm, count = self._view
+        if mm is None:
+            return []
+        stop = 0 if limit is None else max(count - limit, 0)
+        return [self._get(mm, i) for i in range(count - 1, stop - 1, -1)]
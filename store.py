@@ -0,0 +1,367 @@
+# ======================= read-only access to the scraper's article store ===============
+import csv
+import io
+import logging
+import os
+import sys
+import threading
+import zlib
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the thread lock still covers a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_CSV = "output/dhaka_post_today.csv"
+STORE_POLL_INTERVAL = float(os.environ.get("STORE_POLL_INTERVAL", "5"))  # seconds
+# Cached article bodies at least this long (UTF-8 bytes) are kept zlib-compressed; 0 disables
+CONTENT_COMPRESS_MIN = int(os.environ.get("ARTICLE_COMPRESS_MIN", "512"))
+CONTENT_COMPRESS_LEVEL = 1
+SCRAPED_AT_FORMAT = '%Y-%m-%d %H:%M:%S'
+MISSING_CONTENT = "Content not available"  # stored when no article body was found
+
+# Unified article schema served by the API and produced by the scraper
+ARTICLE_FIELDS = ['title', 'date', 'url', 'content', 'images', 'local_images',
+                  'category', 'author', 'scraped_at']
+
+# On-disk CSV columns written by scrapper.py
+CSV_COLUMNS = ['title', 'date', 'url', 'content', 'category', 'author',
+               'image_urls', 'local_images', 'scraped_at']
+
+# Older CSV/dict spellings mapped onto the unified schema
+LEGACY_FIELDS = {'image_urls': 'images', 'timestamp': 'scraped_at'}
+LIST_FIELDS = ('images', 'local_images')
+
+_GUARD_BYTES = 64
+
+_write_lock = threading.RLock()
+_held = {}  # path -> nesting depth of write_lock() in the thread holding _write_lock
+
+
+def split_list(value):
+    """Split a ';'-joined CSV cell into a list"""
+    if not value:
+        return []
+    return [item for item in value.split(';') if item]
+
+
+def row_to_article(row):
+    """Convert a CSV row (dict) into the unified article schema"""
+    article = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        key = LEGACY_FIELDS.get(key, key)
+        if key in ARTICLE_FIELDS and key not in article:
+            article[key] = value
+    for field in ARTICLE_FIELDS:
+        value = article.get(field)
+        if field in LIST_FIELDS:
+            article[field] = value if isinstance(value, list) else split_list(value)
+        elif value is None:
+            article[field] = ""
+    return {field: article[field] for field in ARTICLE_FIELDS}
+
+
+def article_to_row(article):
+    """Convert a unified article dict into an on-disk CSV row"""
+    return {
+        'title': article['title'],
+        'date': article['date'],
+        'url': article['url'],
+        'content': article['content'],
+        'category': article.get('category', 'General'),
+        'author': article.get('author', 'Unknown'),
+        'image_urls': ';'.join(article.get('images', [])),
+        'local_images': ';'.join(article.get('local_images', [])),
+        'scraped_at': article['scraped_at'],
+    }
+
+
+def _pack_content(content):
+    data = content.encode('utf-8')
+    if CONTENT_COMPRESS_MIN and len(data) >= CONTENT_COMPRESS_MIN:
+        packed = zlib.compress(data, CONTENT_COMPRESS_LEVEL)
+        if len(packed) < len(data):
+            return packed
+    return content
+
+
+def _parse_scraped_at(value):
+    # Kept as a datetime only when formatting it gives the stored string back
+    try:
+        parsed = datetime.strptime(value, SCRAPED_AT_FORMAT)
+    except ValueError:
+        return sys.intern(value)
+    return parsed if parsed.strftime(SCRAPED_AT_FORMAT) == value else sys.intern(value)
+
+
+class ArticleRecord(Mapping):
+    """Compact, read-only article in the unified schema
+
+    A plain article dict costs a hash table per article plus full copies of
+    strings most articles share. Records use __slots__, intern category,
+    author and date, keep scraped_at as a datetime and hold long bodies
+    zlib-compressed (Bengali text is 3 bytes per character in UTF-8 and 2 in a
+    str, and compresses to a fraction of either); content is decompressed only
+    when read. Records behave like the dicts they replace: article['url'],
+    .get(), dict(article) and to_dict() give the same values and field order.
+    """
+
+    __slots__ = ('title', 'date', 'url', '_content', 'images', 'local_images',
+                 'category', 'author', '_scraped_at')
+
+    def __init__(self, title, date, url, content, images, local_images, category, author, scraped_at):
+        self.title = title
+        self.date = sys.intern(date)
+        self.url = url
+        self._content = _pack_content(content)
+        self.images = tuple(images)
+        self.local_images = tuple(local_images)
+        self.category = sys.intern(category)
+        self.author = sys.intern(author)
+        self._scraped_at = _parse_scraped_at(scraped_at)
+
+    @classmethod
+    def from_article(cls, article):
+        """Record for a unified-schema article dict (records are returned as is)"""
+        if isinstance(article, cls):
+            return article
+        return cls(*(article.get(field) or ([] if field in LIST_FIELDS else "") for field in ARTICLE_FIELDS))
+
+    @property
+    def content(self):
+        content = self._content
+        return zlib.decompress(content).decode('utf-8') if isinstance(content, bytes) else content
+
+    @property
+    def scraped_at(self):
+        value = self._scraped_at
+        return value.strftime(SCRAPED_AT_FORMAT) if isinstance(value, datetime) else value
+
+    @property
+    def scraped(self):
+        """scraped_at as a naive Bangladesh-time datetime, or None if it does not parse"""
+        value = self._scraped_at
+        return value if isinstance(value, datetime) else None
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        value = getattr(self, key)
+        return list(value) if key in LIST_FIELDS else value
+
+    def __iter__(self):
+        return iter(ARTICLE_FIELDS)
+
+    def __len__(self):
+        return len(ARTICLE_FIELDS)
+
+    def __repr__(self):
+        return f"<ArticleRecord {self.url}>"
+
+    def to_dict(self):
+        """The article as a plain dict, as served by the API"""
+        return {field: self[field] for field in ARTICLE_FIELDS}
+
+
+_FIELD_SET = frozenset(ARTICLE_FIELDS)
+
+
+@contextmanager
+def write_lock(path=OUTPUT_CSV):
+    """Hold the store file's write lock: appends, in-place rewrites and rotation
+    take it so none of them loses another's rows. Also locks out other processes.
+    Re-entrant: a nested call in the same thread relies on the outer file lock."""
+    with _write_lock:
+        if fcntl is None or _held.get(path):
+            _held[path] = _held.get(path, 0) + 1
+            try:
+                yield
+            finally:
+                _held[path] -= 1
+            return
+        lock_path = os.path.join(os.path.dirname(path) or ".", f".{os.path.basename(path)}.lock")
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            _held[path] = 1
+            try:
+                yield
+            finally:
+                _held[path] = 0
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def complete_rows_end(chunk):
+    """Return the byte length of the complete CSV rows at the start of chunk
+
+    A row ends at a newline that is outside a quoted field, i.e. preceded by an
+    even number of quote characters (escaped quotes come in pairs).
+    """
+    end = 0
+    quotes = 0
+    start = 0
+    while True:
+        pos = chunk.find(b'\n', start)
+        if pos < 0:
+            return end
+        quotes += chunk.count(b'"', start, pos)
+        if quotes % 2 == 0:
+            end = pos + 1
+        start = pos + 1
+
+
+class ArticleStore:
+    """Tail the scraper's CSV, parsing only bytes appended since the last refresh"""
+
+    def __init__(self, path=OUTPUT_CSV):
+        self.path = path
+        self._lock = threading.Lock()
+        self._articles = []
+        self._urls = set()
+        self._header = None
+        self._offset = 0
+        self._guard = b""
+        self._ident = None
+        self.loaded = False
+        self.on_new = None  # called with every new article, whoever triggered the refresh
+
+    def __len__(self):
+        return len(self._articles)
+
+    def all(self):
+        """Return every stored article as an ArticleRecord, oldest first"""
+        return list(self._articles)
+
+    def latest(self, limit=None):
+        """Return the most recently stored articles as dicts, newest first"""
+        articles = self._articles
+        if limit is None:
+            records = articles[::-1]
+        else:
+            records = articles[:-limit - 1:-1] if limit > 0 else []
+        return [record.to_dict() for record in records]
+
+    def refresh(self):
+        """Pick up changes to the store file and return newly added articles
+
+        New articles are also passed to on_new here, so a caller that ignores
+        the result (a request warming the cache) does not take them away from
+        the watcher feeding the event stream.
+        """
+        with self._lock:
+            new_articles = self._refresh()
+            if self.on_new:
+                for article in new_articles:
+                    self.on_new(article)
+        return new_articles
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._ident is not None:
+                self._reset()
+            self.loaded = True
+            return []
+
+        ident = (st.st_dev, st.st_ino)
+        if ident != self._ident or st.st_size < self._offset or not self._guard_matches():
+            # File was replaced, truncated or rewritten: start over
+            first_load = not self.loaded
+            known_urls = self._urls
+            self._reset()
+            self._ident = ident
+            new_articles = self._read_tail(st.st_size)
+            self.loaded = True
+            if first_load:
+                return []
+            return [a for a in new_articles if a['url'] not in known_urls]
+
+        self.loaded = True
+        if st.st_size == self._offset:
+            return []
+        return self._read_tail(st.st_size)
+
+    def _reset(self):
+        self._articles = []
+        self._urls = set()
+        self._header = None
+        self._offset = 0
+        self._guard = b""
+        self._ident = None
+
+    def _guard_matches(self):
+        if not self._guard:
+            return True
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset - len(self._guard))
+                return f.read(len(self._guard)) == self._guard
+        except OSError:
+            return False
+
+    def _read_tail(self, size):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = complete_rows_end(chunk)
+        if not end:
+            return []
+        chunk = chunk[:end]
+
+        rows = csv.reader(io.StringIO(chunk.decode('utf-8-sig' if not self._offset else 'utf-8')))
+        new_articles = []
+        for row in rows:
+            if not row:
+                continue
+            if self._header is None:
+                self._header = row
+                continue
+            article = ArticleRecord.from_article(row_to_article(dict(zip(self._header, row))))
+            if article.url in self._urls:
+                continue
+            self._urls.add(article.url)
+            self._articles.append(article)
+            new_articles.append(article)
+
+        self._offset += end
+        self._guard = chunk[-_GUARD_BYTES:]
+        if new_articles:
+            logger.info(f"Loaded {len(new_articles)} articles from {self.path} ({len(self._articles)} total)")
+        return new_articles
+
+
+class StoreWatcher(threading.Thread):
+    """Background thread that refreshes a store, which hands new articles to on_new
+
+    upgrade, if given, is called with the current store before every refresh
+    and may return a different store to watch from then on.
+    """
+
+    def __init__(self, store, on_new=None, interval=STORE_POLL_INTERVAL, upgrade=None):
+        super().__init__(name="store-watcher", daemon=True)
+        self.store = store
+        if on_new:
+            store.on_new = on_new
+        self.interval = interval
+        self.upgrade = upgrade
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.upgrade:
+                    self.store = self.upgrade(self.store) or self.store
+                self.store.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing article store: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
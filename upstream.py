@@ -0,0 +1,372 @@
+# ======================= adaptive timeouts and circuit breaking per upstream host ===============
+#
+# Every outbound GET goes through get(), which keeps state per host
+# (dhakapost.com and its image CDN are tracked separately):
+#
+# * Timeouts follow the host's recent response times: UPSTREAM_TIMEOUT_FACTOR
+#   times the UPSTREAM_TIMEOUT_PERCENTILE of the last UPSTREAM_WINDOW requests,
+#   kept between UPSTREAM_MIN_TIMEOUT and the caller's timeout. A slow page
+#   costs a few seconds instead of the caller's full 15-30s budget.
+# * After UPSTREAM_BREAKER_FAILURES consecutive failures (connection errors,
+#   timeouts, 429 and 5xx responses) the host's circuit opens. Requests then
+#   fail at once with CircuitOpenError until the cooldown has passed. After
+#   that a single probe request is let through: success closes the circuit,
+#   failure reopens it with twice the cooldown, up to UPSTREAM_BREAKER_MAX_COOLDOWN.
+# * With hedge=True (listing pages, when UPSTREAM_HEDGE=1) a second identical
+#   request is sent if the first has not answered within the host's
+#   UPSTREAM_HEDGE_PERCENTILE latency; whichever answers first is used.
+# * A stream=True response only counts as a success once its body has been
+#   read (iter_body(), or body_read() for callers reading response.raw). A
+#   read timeout or reset mid-body counts as a failure, so a host that sends
+#   headers and then stalls still opens its circuit.
+#
+# Pages we parse are read with get_body(), which streams the body as bytes,
+# refuses bodies larger than UPSTREAM_MAX_BODY_BYTES and resolves the encoding
+# from a BOM, the Content-Type charset or a <meta> charset, else UTF-8.
+# response.text would instead run charset detection over the whole body
+# whenever the header has no charset, which is slow on large Bangla pages.
+import codecs
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WINDOW = int(os.environ.get("UPSTREAM_WINDOW", "100"))                 # latency samples kept per host
+MIN_SAMPLES = 10                                                        # below this the caller's timeout is used
+TIMEOUT_PERCENTILE = float(os.environ.get("UPSTREAM_TIMEOUT_PERCENTILE", "95"))
+TIMEOUT_FACTOR = float(os.environ.get("UPSTREAM_TIMEOUT_FACTOR", "3"))
+MIN_TIMEOUT = float(os.environ.get("UPSTREAM_MIN_TIMEOUT", "2"))        # seconds
+CONNECT_TIMEOUT = 5.0
+BREAKER_FAILURES = int(os.environ.get("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_COOLDOWN", "30"))           # seconds
+BREAKER_MAX_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_MAX_COOLDOWN", "600"))  # seconds
+HEDGE_LISTINGS = os.environ.get("UPSTREAM_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("UPSTREAM_HEDGE_PERCENTILE", "90"))
+HEDGE_MIN_DELAY = 0.05  # seconds
+HEDGE_WORKERS = 8
+MAX_BODY_BYTES = int(os.environ.get("UPSTREAM_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+BODY_CHUNK_SIZE = 64 * 1024
+DEFAULT_ENCODING = 'utf-8'
+META_SNIFF_BYTES = 4096  # <meta charset> must appear this early to count
+
+_BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+_HEADER_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.I)
+# Matches both <meta charset="..."> and <meta http-equiv=... content="text/html; charset=...">
+_META_CHARSET = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([\w.:-]+)', re.I)
+
+SHORT_CIRCUITS = metrics.REGISTRY.counter(
+    'scraper_upstream_short_circuits_total', 'Requests failed fast because the host circuit was open', ['host'])
+CIRCUIT_OPENS = metrics.REGISTRY.counter(
+    'scraper_upstream_circuit_opens_total', 'Times a host circuit opened', ['host'])
+HEDGED_REQUESTS = metrics.REGISTRY.counter(
+    'scraper_upstream_hedged_requests_total', 'Second requests sent for a slow listing page', ['host'])
+OVERSIZED_BODIES = metrics.REGISTRY.counter(
+    'scraper_upstream_oversized_bodies_total', 'Responses dropped for exceeding the body size limit', ['host'])
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The host has been failing and is not being contacted until its cooldown ends"""
+
+
+class BodyTooLargeError(requests.RequestException):
+    """The response body is larger than the caller's limit"""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a request may be sent now; lets one probe through per cooldown once open"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now < self.retry_at:
+                return False
+            # Until the probe reports back, the next one waits a full cooldown
+            self.state = self.HALF_OPEN
+            self.retry_at = now + self.cooldown
+            return True
+
+    def record_success(self):
+        """Returns True if this closed an open circuit"""
+        with self._lock:
+            recovered = self.state != self.CLOSED
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            return recovered
+
+    def record_failure(self):
+        """Returns True if this opened the circuit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.state == self.OPEN or self.failures < self.failure_threshold:
+                return False
+            self.state = self.OPEN
+            self.retry_at = time.monotonic() + self.cooldown
+            return True
+
+
+class HostState:
+    """Recent latencies and the circuit breaker of one upstream host"""
+
+    def __init__(self, host, window=WINDOW):
+        self.host = host
+        self.breaker = CircuitBreaker()
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, pct):
+        """Latency at pct over the window, or None with too few samples"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def timeout(self, ceiling):
+        """(connect, read) timeout for the next request, never above the caller's ceiling"""
+        observed = self.percentile(TIMEOUT_PERCENTILE)
+        read = ceiling if observed is None else min(ceiling, max(MIN_TIMEOUT, observed * TIMEOUT_FACTOR))
+        return min(CONNECT_TIMEOUT, read), read
+
+    def hedge_delay(self):
+        observed = self.percentile(HEDGE_PERCENTILE)
+        return None if observed is None else max(HEDGE_MIN_DELAY, observed)
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+_hedge_executor = None
+
+
+def host_state(url):
+    host = urlparse(url).netloc
+    state = _hosts.get(host)
+    if state is None:
+        with _hosts_lock:
+            state = _hosts.setdefault(host, HostState(host))
+    return state
+
+
+def _is_failure(response):
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def _send(state, url, timeout, kwargs):
+    if not state.breaker.allow():
+        SHORT_CIRCUITS.inc(state.host)
+        raise CircuitOpenError(f"circuit open for {state.host}; skipping {url}")
+
+    connect, read = state.timeout(timeout)
+    start = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=(connect, read), **kwargs)
+    except (requests.Timeout, requests.ConnectionError):
+        # A timeout is a lower bound on the real latency; keeping it lets
+        # the timeout grow when the whole host slows down
+        state.observe(time.perf_counter() - start)
+        _record_failure(state)
+        raise
+
+    state.observe(response.elapsed.total_seconds())
+    if _is_failure(response):
+        _record_failure(state)
+    elif kwargs.get('stream'):
+        # Whether the host delivered is only known after the body; see body_read()
+        response.upstream_state = state
+    elif state.breaker.record_success():
+        logger.info(f"Upstream {state.host} recovered; circuit closed")
+    return response
+
+
+def body_read(response, error=None, seconds=0.0):
+    """Report how reading a stream=True response's body went
+
+    error is the exception that ended the read, or None on success; seconds
+    is how long the read took. A failure is recorded against the host like a
+    failed request, with headers-plus-body time as its latency sample.
+    """
+    state = getattr(response, 'upstream_state', None)
+    if state is None:  # not from get(stream=True), or already reported as a failed status
+        return
+    response.upstream_state = None
+    if error is None:
+        if state.breaker.record_success():
+            logger.info(f"Upstream {state.host} recovered; circuit closed")
+        return
+    state.observe(response.elapsed.total_seconds() + seconds)
+    _record_failure(state)
+
+
+def iter_body(response, chunk_size=BODY_CHUNK_SIZE):
+    """response.iter_content() that reports the outcome to body_read()
+
+    Stopping early (e.g. the body is too large) reports nothing.
+    """
+    start = time.perf_counter()
+    try:
+        for chunk in response.iter_content(chunk_size):
+            yield chunk
+    except requests.RequestException as e:
+        # Read timeouts, ChunkedEncodingError and resets mid-body all arrive as RequestException
+        body_read(response, e, time.perf_counter() - start)
+        raise
+    body_read(response)
+
+
+def _record_failure(state):
+    if state.breaker.record_failure():
+        CIRCUIT_OPENS.inc(state.host)
+        logger.warning(f"Upstream {state.host} is failing; circuit open for {state.breaker.cooldown:.0f}s")
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _hedged(state, url, timeout, kwargs):
+    global _hedge_executor
+    delay = state.hedge_delay()
+    if delay is None:
+        return _send(state, url, timeout, kwargs)
+    if _hedge_executor is None:
+        with _hosts_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+    pending = {_hedge_executor.submit(_send, state, url, timeout, kwargs)}
+    done, pending = wait(pending, timeout=delay)
+    if not done:
+        HEDGED_REQUESTS.inc(state.host)
+        pending.add(_hedge_executor.submit(_send, state, url, timeout, kwargs))
+
+    error = None
+    while done or pending:
+        if not done:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        future = done.pop()
+        if future.exception() is None:
+            for other in done | pending:
+                other.add_done_callback(_close_response)
+            return future.result()
+        error = future.exception()
+    raise error
+
+
+def get(url, timeout=30, hedge=False, **kwargs):
+    """requests.get with the host's adaptive timeout, circuit breaker and optional hedging
+
+    timeout is the longest the caller is willing to wait; raises
+    CircuitOpenError (a requests.ConnectionError) while the host's circuit is open.
+    """
+    state = host_state(url)
+    if hedge:
+        return _hedged(state, url, timeout, kwargs)
+    return _send(state, url, timeout, kwargs)
+
+
+def _codec_name(label):
+    try:
+        return codecs.lookup(label.decode('ascii') if isinstance(label, bytes) else label).name
+    except (LookupError, UnicodeDecodeError):
+        return None
+
+
+def resolve_encoding(content, content_type=None):
+    """Encoding to decode a body with: BOM, then Content-Type charset, then <meta> charset, else UTF-8"""
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+    match = _HEADER_CHARSET.search(content_type or '')
+    encoding = _codec_name(match.group(1)) if match else None
+    if encoding:
+        return encoding
+    match = _META_CHARSET.search(content, 0, META_SNIFF_BYTES)
+    encoding = _codec_name(match.group(1)) if match else None
+    # A page that could declare itself in ASCII is not UTF-16, whatever it claims
+    if encoding and not encoding.startswith('utf-16'):
+        return encoding
+    return DEFAULT_ENCODING
+
+
+def read_body(response, max_bytes=MAX_BODY_BYTES):
+    """Read a stream=True response into bytes and close it
+
+    Raises BodyTooLargeError as soon as the (decompressed) body passes max_bytes,
+    so an oversized page costs at most max_bytes of memory.
+    """
+    host = urlparse(response.url).netloc
+    try:
+        declared = response.headers.get('Content-Length', '')
+        if declared.isdigit() and int(declared) > max_bytes:
+            OVERSIZED_BODIES.inc(host)
+            raise BodyTooLargeError(f"{response.url} declares {declared} bytes, over the {max_bytes} limit",
+                                    response=response)
+        chunks = []
+        size = 0
+        for chunk in iter_body(response):
+            size += len(chunk)
+            if size > max_bytes:
+                OVERSIZED_BODIES.inc(host)
+                raise BodyTooLargeError(f"{response.url} is over the {max_bytes} byte limit", response=response)
+            chunks.append(chunk)
+        return b''.join(chunks)
+    finally:
+        response.close()
+
+
+def get_body(url, timeout=30, hedge=False, max_bytes=MAX_BODY_BYTES, **kwargs):
+    """get() a page and read its body: returns (response, content bytes, encoding)
+
+    content is capped at max_bytes and encoding always names a codec, so
+    content.decode(encoding, errors='replace') never needs charset detection.
+    Check response.status_code / raise_for_status() as usual.
+    """
+    response = get(url, timeout=timeout, hedge=hedge, stream=True, **kwargs)
+    content = read_body(response, max_bytes)
+    return response, content, resolve_encoding(content, response.headers.get('Content-Type'))
+
+
+def snapshot():
+    """Per-host timeout, latency percentiles and circuit state"""
+    result = {}
+    for host, state in sorted(_hosts.items()):
+        p50, p99 = state.percentile(50), state.percentile(99)
+        result[host] = {
+            'circuit': state.breaker.state,
+            'consecutive_failures': state.breaker.failures,
+            'p50_seconds': round(p50, 3) if p50 is not None else None,
+            'p99_seconds': round(p99, 3) if p99 is not None else None,
+            'read_timeout_seconds': round(state.timeout(30)[1], 3),
+        }
+    return result